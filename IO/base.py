@@ -2,6 +2,8 @@ import glob
 import numpy as np
 import os
 import pickle
+from utils.functions.states import is_indexed_state, load_indexed_bots, remove_indexed_state, \
+                                   save_deduplicated_state, save_indexed_state
 
 class IOBase:
     """
@@ -31,6 +33,9 @@ class IOBase:
         if self.args.population_size % self.size != 0:
             raise RuntimeError("`args.population_size` must be a multiple of number of MPI processes.")
 
+        if self.args.nb_threads < 1:
+            raise RuntimeError("`args.nb_threads` must be >= 1.")
+
         self.setup_elitism()
         self.setup_save_points()
         self.setup_state_path()
@@ -59,6 +64,9 @@ class IOBase:
 
             self.args.elitism = int(self.args.elitism)
 
+        if self.args.elite_trials < -1:
+            raise RuntimeError("`args.elite_trials` must not be < -1.")
+
     def setup_save_points(self):
         """
         Method called upon object initialization.
@@ -146,22 +154,77 @@ class IOBase:
         if self.args.communication == 'ps_p2p' and len(state) == 3:
             raise RuntimeError("`args.communication` = 'ps_p2p' while the saved state used 'ps'")
 
+        if is_indexed_state(load_path, self.rank):
+            state[-1] = load_indexed_bots(load_path, self.rank)
+
         return state
 
-    def save_state(self, state, gen_nb):
+    def save_state(self, state, gen_nb, fitnesses=None, pickled=False):
         """
         Save the current experiment's state.
 
         :param gen_nb: Current generation number
         :type args: int
+        :param fitnesses: Fitnesses of the bots making up the state's last element ('ps_p2p' and 'big_ps_p2p').
+        :type fitnesses: np.ndarray
+        :param pickled: Whether the state's last element is an iterable over pickled bots (e.g. the entries of a
+                        `PopulationStore`), saved one at a time by the 'indexed' & 'deduplicated' layouts ('pickle'
+                        layout : all unpickled to be saved as a single pickle).
+        :type pickled: bool
         """
         save_path = self.path + str(self.args.population_size) + '/' + str(gen_nb) + '/'
 
         if not os.path.exists(save_path):
             os.makedirs(save_path, exist_ok=True)
-        
-        with open(save_path + str(self.rank) + '.pkl', 'wb') as f:
-            pickle.dump(state, f)
+
+        if self.args.state_layout == 'indexed' and fitnesses is not None:
+
+            save_indexed_state(save_path, self.rank, state, fitnesses, pickled)
+
+        elif self.args.state_layout == 'deduplicated' and fitnesses is not None:
+
+            save_deduplicated_state(save_path, self.rank, state, fitnesses, pickled)
+
+        else:
+
+            remove_indexed_state(save_path, self.rank)
+
+            if pickled:
+                state = state[:-1] + [[pickle.loads(pickled_bot) for pickled_bot in state[-1]]]
+
+            with open(save_path + str(self.rank) + '.pkl', 'wb') as f:
+                pickle.dump(state, f)
+
+    def load_array(self, name):
+        """
+        Load an array saved alongside a previous experiment's state.
+        Returns None if no such array was saved.
+
+        :param name: Name of the array
+        :type name: string
+        """
+        load_path = self.path + str(self.args.population_size) + '/' + str(self.args.nb_elapsed_generations) + '/'
+
+        if not os.path.isfile(load_path + name + '.npy'):
+            return None
+
+        return np.load(load_path + name + '.npy')
+
+    def save_array(self, array, name, gen_nb):
+        """
+        Save an array alongside the current experiment's state.
+
+        :param name: Name of the array
+        :type name: string
+        :param gen_nb: Current generation number
+        :type args: int
+        """
+        save_path = self.path + str(self.args.population_size) + '/' + str(gen_nb) + '/'
+
+        if not os.path.exists(save_path):
+            os.makedirs(save_path, exist_ok=True)
+
+        np.save(save_path + name + '.npy', array)
 
 class IO(IOBase):
     pass
\ No newline at end of file
@@ -1,6 +1,4 @@
-import numpy as np
-import torch
-import random
+from utils.functions.misc import set_seeds
 
 class BotBase:
     """
@@ -47,9 +45,7 @@ class BotBase:
         """
         if seed > 0:
             
-            np.random.seed(seed)
-            torch.manual_seed(seed)
-            random.seed(seed)
+            set_seeds(seed)
             
             self.mutate()
 
@@ -99,9 +95,56 @@ class BotBase:
         for net in self.nets:
             net.reset()
 
+    def get_stats(self):
+        """
+        Structural statistics of the bot, returned as a dictionary of numbers (e.g. {'nb_nodes' : 10}).
+        Recorded every generation, they need to share the same keys across bots.
+        Can be implemented.
+        """
+        return {}
+
+    def get_running_state(self):
+        """
+        Attributes of the bot updated when it is run (e.g. running observation statistics), as opposed to those only
+        changed through mutations, returned as a dictionary ({attribute name : value}).
+        Saved apart from the rest of the bot by the 'deduplicated' state layout, so that unmutated bots keep being
+        stored once.
+        Can be implemented.
+        """
+        return {}
+
     def __call__(self, x):
         """
         Run bot for one timestep given input 'x'.
         Should be implemented.
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+class BotBatchBase:
+    """
+    Bot Batch Base class.
+    Bot Batch objects run several bots in lockstep, one timestep at a time, so that their inference can be batched.
+    This default implementation runs the bots one after another.
+    Subclasses need to be named *BotBatch*.
+
+    :param bots: Bots to run in lockstep.
+    :type bots: list
+    """
+    def __init__(self, bots):
+
+        self.bots = bots
+
+    def reset(self):
+        """
+        Reset the bots and their nets' inner states.
+        """
+        for bot in self.bots:
+            bot.reset()
+
+    def __call__(self, x, mask):
+        """
+        Run the bots for one timestep given their respective inputs 'x'.
+        Bots whose 'mask' entry is False (finished episodes) are not run and get None as output.
+        Can be implemented to batch the bots' inference.
+        """
+        return [bot(x_i) if mask_i else None for bot, x_i, mask_i in zip(self.bots, x, mask)]
@@ -52,6 +52,18 @@ class DynamicBotBase(BotBase):
 
             np.random.choice(self.nets_arch_muts)()
 
+    def get_stats(self):
+        """
+        Structural statistics of the dynamic bot, summed over its nets.
+        """
+        stats = {}
+
+        for net in self.nets:
+            for key, value in net.get_stats().items():
+                stats[key] = stats.get(key, 0) + value
+
+        return stats
+
     def __call__(self, x):
         """
         Run dynamic bot for one timestep given input 'x'.
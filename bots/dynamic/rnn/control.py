@@ -1,7 +1,8 @@
 import numpy as np
 
+from bots.base import BotBatchBase
 from bots.dynamic.base import DynamicBotBase
-from nets.dynamic.recurrent import Net
+from nets.dynamic.recurrent import Net, NetBatch, plan_cache
 from utils.functions.gym import get_info
 
 class Bot(DynamicBotBase):
@@ -18,7 +19,17 @@ class Bot(DynamicBotBase):
 
         self.nets = [self.net]
 
-        self.mean = self.v = self.std = self.n = 0
+        if self.args.additional_arguments.get('normalization', 'bot') == 'bot': # Running observation statistics
+            self.mean = self.v = self.std = self.n = 0
+
+    def get_running_state(self):
+
+        return {name: getattr(self, name) for name in ['mean', 'v', 'std', 'n'] if hasattr(self, name)}
+
+    def pre_setup_to_run(self):
+
+        if hasattr(self.args, 'plan_cache_size'): # Backward compatibility
+            plan_cache.size = self.args.plan_cache_size
 
     def update_mean_std(self, x):
 
@@ -31,6 +42,9 @@ class Bot(DynamicBotBase):
 
     def env_to_net(self, x):
         
+        if self.args.additional_arguments.get('normalization', 'bot') == 'shared': # Standardized by the environment
+            return x
+
         if hasattr(self, 'n'): # Backward compatibility
             self.n += 1
 
@@ -64,4 +78,27 @@ class Bot(DynamicBotBase):
         x = self.net(x)
         x = self.net_to_env(x)
 
-        return x
\ No newline at end of file
+        return x
+
+class BotBatch(BotBatchBase):
+
+    def __init__(self, bots):
+
+        super().__init__(bots)
+
+        self.net = NetBatch([bot.net for bot in bots])
+
+    def reset(self):
+
+        super().reset()
+
+        self.net.reset()
+
+    def __call__(self, x, mask):
+
+        x = np.array([bot.env_to_net(x_i) if mask_i else np.zeros(len(x_i))
+                      for bot, x_i, mask_i in zip(self.bots, x, mask)])
+
+        x = self.net(x)
+
+        return [bot.net_to_env(x_i[:, None]) if mask_i else None for bot, x_i, mask_i in zip(self.bots, x, mask)]
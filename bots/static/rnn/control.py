@@ -1,8 +1,9 @@
 import numpy as np
 import torch
 
+from bots.base import BotBatchBase
 from bots.static.base import StaticBotBase
-from nets.static.rnn import Net
+from nets.static.rnn import Net, NetBatch
 from utils.functions.gym import get_info
 
 class Bot(StaticBotBase):
@@ -19,7 +20,12 @@ class Bot(StaticBotBase):
 
         self.nets = [self.net]
 
-        self.mean = self.v = self.std = self.n = 0
+        if self.args.additional_arguments.get('normalization', 'bot') == 'bot': # Running observation statistics
+            self.mean = self.v = self.std = self.n = 0
+
+    def get_running_state(self):
+
+        return {name: getattr(self, name) for name in ['mean', 'v', 'std', 'n'] if hasattr(self, name)}
 
     def update_mean_std(self, x):
 
@@ -32,6 +38,11 @@ class Bot(StaticBotBase):
         
     def env_to_net(self, x):
 
+        if self.args.additional_arguments.get('normalization', 'bot') == 'shared': # Standardized by the environment
+            x = x[None, :]
+            x = torch.Tensor(x)
+            return x
+
         if hasattr(self, 'n'): # Backward compatibility
             self.n += 1
 
@@ -71,4 +82,29 @@ class Bot(StaticBotBase):
         x = self.net(x)
         x = self.net_to_env(x)
 
-        return x
\ No newline at end of file
+        return x
+
+class BotBatch(BotBatchBase):
+
+    def __init__(self, bots):
+
+        super().__init__(bots)
+
+        self.net = NetBatch([bot.net for bot in bots])
+
+    def reset(self):
+
+        super().reset()
+
+        self.net.reset()
+
+    def __call__(self, x, mask):
+
+        d_input = int(self.net.dimensions[0])
+
+        x = torch.cat([bot.env_to_net(x_i) if mask_i else torch.zeros(1, d_input)
+                       for bot, x_i, mask_i in zip(self.bots, x, mask)]).to(self.net.device)
+
+        x = self.net(x, torch.tensor(mask).to(self.net.device))
+
+        return [bot.net_to_env(x[i:i+1]) if mask_i else None for i, (bot, mask_i) in enumerate(zip(self.bots, mask))]
@@ -0,0 +1,205 @@
+import collections
+import numpy as np
+
+class CommBase:
+    """
+    Comm Base class.
+    Comm objects handle the communication between processes.
+    They expose the subset of mpi4py's communicator interface made use of by the library.
+    Subclasses need to be named *Comm*.
+
+    :param args: Experiment specific arguments (obtained through argparse).
+    :type args: Namespace
+    """
+    def __init__(self, args):
+
+        self.args = args
+
+        # Number of bytes sent & received by this process so far (for monitoring), to be incremented by subclasses
+        self.nb_bytes_sent = 0
+        self.nb_bytes_received = 0
+
+    def Get_rank(self):
+        """
+        Rank of this process.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def Get_size(self):
+        """
+        Number of processes.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def Get_node_size(self):
+        """
+        Number of processes running on this process' node.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def Scatter(self, sendbuf, recvbuf, root=0):
+        """
+        Scatter equal chunks (along the first axis) of NumPy array 'sendbuf' from 'root' to all processes' 'recvbuf'.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def Gather(self, sendbuf, recvbuf, root=0):
+        """
+        Gather all processes' NumPy array 'sendbuf' into chunks (along the first axis) of 'root''s 'recvbuf'.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def Allreduce(self, sendbuf, recvbuf):
+        """
+        Sum all processes' NumPy array 'sendbuf' into all processes' 'recvbuf'.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def scatter(self, sendobj, root=0):
+        """
+        Scatter the elements of 'root''s list 'sendobj' (one per process), returns this process' element.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def gather(self, sendobj, root=0):
+        """
+        Gather all processes' 'sendobj' into a list returned on 'root' (None is returned on other processes).
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def isend(self, obj, dest, tag=0):
+        """
+        Non-blocking send of (picklable) object 'obj' to process 'dest', returns a request.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def irecv(self, buf=None, source=0, tag=0):
+        """
+        Non-blocking receive of an object from process 'source', returns a request.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def waitall(self, requests):
+        """
+        Wait for all 'requests' to complete, returns the list of received objects (None for sends).
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def Isend(self, buf, dest, tag=0):
+        """
+        Non-blocking send of buffer 'buf' (NumPy array or bytes-like object) to process 'dest', returns a request.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def Irecv(self, buf, source=0, tag=0):
+        """
+        Non-blocking receive from process 'source' into preallocated writable buffer 'buf', returns a request.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def Waitall(self, requests):
+        """
+        Wait for all buffer 'requests' to complete.
+        Should be implemented.
+        """
+        raise NotImplementedError
+
+    def exchange(self, sends, receives, chunk_size=2**30, max_nb_bytes=None):
+        """
+        Exchange buffers of any size (e.g. pickled bots) between processes, streaming them so that they need not all be
+        held in memory at once.
+        Transfers are carried out in increasing order of their tags (unique, shared by both ends of a transfer, which
+        makes the exchange deadlock-free). A buffer's size is sent first (as an integer), the buffer then being
+        streamed in chunks of at most 'chunk_size' bytes (MPI messages being limited to 2GB) into a receive buffer
+        preallocated to its exact size.
+        Buffers to send are only obtained once their transfer starts, received ones are handed over as soon as they
+        are complete and transfers are completed (in order) as soon as the buffers being sent exceed 'max_nb_bytes'.
+        Buffers sent by a process to itself are handed over directly.
+
+        :param sends: (get_buffer, dest, tag) triplets, `get_buffer()` returning the buffer to send.
+        :type sends: list
+        :param receives: (set_buffer, source, tag) triplets, `set_buffer(buffer)` being called on the received buffer
+                         (bytearray, or the buffer itself if sent by this process).
+        :type receives: list
+        :param chunk_size: Maximum size of a message.
+        :type chunk_size: int
+        :param max_nb_bytes: Maximum combined size of the buffers being sent at once, beyond that of the latest one
+                             (None : unbounded).
+        :type max_nb_bytes: int
+        """
+        rank = self.Get_rank()
+
+        self_receives = {tag: set_buffer for set_buffer, source, tag in receives if source == rank}
+
+        transfers = sorted([(tag, False, get_buffer, dest) for get_buffer, dest, tag in sends] +
+                           [(tag, True, set_buffer, source) for set_buffer, source, tag in receives if source != rank],
+                           key=lambda transfer: transfer[0])
+
+        def complete(transfer):
+
+            receiving, function, peer, tag, buf, requests = transfer
+
+            self.Waitall(requests)
+
+            if not receiving:
+                return len(buf)
+
+            received_buf = bytearray(int(buf[0]))
+
+            view = memoryview(received_buf)
+
+            self.Waitall([self.Irecv(view[start:start+chunk_size], peer, tag)
+                          for start in range(0, len(view), chunk_size)])
+
+            function(received_buf)
+
+            return 0
+
+        in_flight = collections.deque()
+        nb_bytes = 0
+
+        for tag, receiving, function, peer in transfers:
+
+            if not receiving and rank == peer:
+
+                self_receives.pop(tag)(function())
+
+            elif receiving:
+
+                size = np.empty(1, dtype=np.uint64)
+
+                requests = [self.Irecv(size, peer, tag)]
+
+                in_flight.append( (receiving, function, peer, tag, size, requests) )
+
+            else: # sending
+
+                buf = memoryview(function()).cast('B')
+
+                requests = [self.Isend(np.array([len(buf)], dtype=np.uint64), peer, tag)]
+
+                for start in range(0, len(buf), chunk_size):
+                    requests.append( self.Isend(buf[start:start+chunk_size], peer, tag) )
+
+                in_flight.append( (receiving, function, peer, tag, buf, requests) )
+
+                nb_bytes += len(buf)
+
+            while max_nb_bytes != None and nb_bytes > max_nb_bytes:
+                nb_bytes -= complete(in_flight.popleft())
+
+        while len(in_flight) > 0:
+            complete(in_flight.popleft())
@@ -0,0 +1,262 @@
+import atexit
+import multiprocessing
+import numpy as np
+import os
+import pickle
+import queue
+import signal
+import sys
+
+from comms.base import CommBase
+
+SCATTER_TAG = -1
+GATHER_TAG = -2
+ALLREDUCE_TAG = -3
+
+class Comm(CommBase):
+    """
+    Single-node backend, does not require MPI.
+    Upon initialization, the process forks `args.nb_processes` - 1 processes that all carry on executing the script.
+    Every process owns an inbox (multiprocessing queue) in which the others put their pickled messages.
+    Messages from a given process are received in the order they were sent, like with MPI.
+    """
+    def __init__(self, args):
+
+        super().__init__(args)
+
+        if args.nb_processes < 1:
+            raise RuntimeError("`args.nb_processes` must be >= 1.")
+
+        self.size = args.nb_processes
+        self.rank = 0
+
+        self.inboxes = [multiprocessing.Queue() for _ in range(self.size)]
+
+        # Messages received but not yet asked for, per source
+        self.pending = [[] for _ in range(self.size)]
+
+        self.parent = os.getpid()
+        self.children = []
+
+        for rank in range(1, self.size):
+
+            pid = os.fork()
+
+            if pid == 0:
+                self.rank = rank
+                self.children = []
+                break
+
+            self.children.append(pid)
+
+        if self.rank == 0:
+            atexit.register(self.wait_for_children)
+            sys.excepthook = self.terminate_children(sys.excepthook)
+
+    def terminate_children(self, excepthook):
+        """
+        Wraps the primary process' exception hook so that secondary processes do not wait on it forever.
+        """
+        def hook(*args):
+
+            for pid in self.children:
+                os.kill(pid, signal.SIGTERM)
+
+            excepthook(*args)
+
+        return hook
+
+    def wait_for_children(self):
+
+        for pid in self.children:
+            os.waitpid(pid, 0)
+
+        self.children = []
+
+    def check_processes(self):
+        """
+        Raises an error if any other process died, which would otherwise leave this one waiting forever.
+        """
+        if self.rank == 0:
+
+            for pid in self.children.copy():
+
+                waited_pid, status = os.waitpid(pid, os.WNOHANG)
+
+                if waited_pid != 0:
+
+                    self.children.remove(pid)
+
+                    if status != 0:
+                        raise RuntimeError("A secondary process exited with status " + str(status) + ".")
+
+        elif os.getppid() != self.parent:
+
+            raise RuntimeError("The primary process exited.")
+
+    def send(self, obj, dest, tag):
+
+        # Pickled right away as the object might be modified before the queue's thread gets to it
+        message = pickle.dumps((self.rank, tag, obj), protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.nb_bytes_sent += len(message)
+
+        self.inboxes[dest].put(message)
+
+    def recv(self, source, tag):
+
+        for i, (message_tag, obj) in enumerate(self.pending[source]):
+            if message_tag == tag:
+                del self.pending[source][i]
+                return obj
+
+        while True:
+
+            try:
+                message = self.inboxes[self.rank].get(timeout=1)
+            except queue.Empty:
+                self.check_processes()
+                continue
+
+            self.nb_bytes_received += len(message)
+
+            message_source, message_tag, obj = pickle.loads(message)
+
+            if message_source == source and message_tag == tag:
+                return obj
+
+            self.pending[message_source].append((message_tag, obj))
+
+    def Get_rank(self):
+
+        return self.rank
+
+    def Get_size(self):
+
+        return self.size
+
+    def Get_node_size(self):
+
+        return self.size
+
+    def Scatter(self, sendbuf, recvbuf, root=0):
+
+        if self.rank == root:
+
+            chunks = np.split(sendbuf, self.size)
+
+            for rank in range(self.size):
+                if rank != root:
+                    self.send(chunks[rank], rank, SCATTER_TAG)
+
+            recvbuf[:] = chunks[root]
+
+        else:
+
+            recvbuf[:] = self.recv(root, SCATTER_TAG)
+
+    def Gather(self, sendbuf, recvbuf, root=0):
+
+        if self.rank == root:
+
+            chunks = np.split(recvbuf, self.size)
+
+            for rank in range(self.size):
+                chunks[rank][:] = sendbuf if rank == root else self.recv(rank, GATHER_TAG)
+
+        else:
+
+            self.send(sendbuf, root, GATHER_TAG)
+
+    def Allreduce(self, sendbuf, recvbuf):
+
+        # Summed up by the primary process (in rank order) & sent back
+        if self.rank == 0:
+
+            sums = sendbuf.copy()
+
+            for rank in range(1, self.size):
+                sums += self.recv(rank, ALLREDUCE_TAG)
+
+            for rank in range(1, self.size):
+                self.send(sums, rank, ALLREDUCE_TAG)
+
+            recvbuf[:] = sums
+
+        else:
+
+            self.send(sendbuf, 0, ALLREDUCE_TAG)
+
+            recvbuf[:] = self.recv(0, ALLREDUCE_TAG)
+
+    def scatter(self, sendobj, root=0):
+
+        if self.rank == root:
+
+            for rank in range(self.size):
+                if rank != root:
+                    self.send(sendobj[rank], rank, SCATTER_TAG)
+
+            return sendobj[root]
+
+        return self.recv(root, SCATTER_TAG)
+
+    def gather(self, sendobj, root=0):
+
+        if self.rank == root:
+            return [sendobj if rank == root else self.recv(rank, GATHER_TAG) for rank in range(self.size)]
+
+        self.send(sendobj, root, GATHER_TAG)
+
+    def isend(self, obj, dest, tag=0):
+
+        self.send(obj, dest, tag)
+
+        return Request()
+
+    def irecv(self, buf=None, source=0, tag=0):
+
+        return Request(self, source, tag)
+
+    def waitall(self, requests):
+
+        return [request.wait() for request in requests]
+
+    def Isend(self, buf, dest, tag=0):
+
+        self.send(bytes(memoryview(buf).cast('B')), dest, tag)
+
+        return Request()
+
+    def Irecv(self, buf, source=0, tag=0):
+
+        return Request(self, source, tag, buf)
+
+    def Waitall(self, requests):
+
+        for request in requests:
+            request.wait()
+
+class Request:
+    """
+    Requests are completed upon waiting (sends complete right away).
+    Buffer receives copy the received bytes into their buffer.
+    """
+    def __init__(self, comm=None, source=None, tag=None, buf=None):
+
+        self.comm = comm
+        self.source = source
+        self.tag = tag
+        self.buf = buf
+
+    def wait(self):
+
+        if self.comm == None:
+            return None
+
+        obj = self.comm.recv(self.source, self.tag)
+
+        if self.buf is not None:
+            memoryview(self.buf).cast('B')[:] = obj
+
+        return obj
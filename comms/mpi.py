@@ -0,0 +1,104 @@
+import pickle
+from mpi4py import MPI
+
+from comms.base import CommBase
+
+class Comm(CommBase):
+    """
+    Default backend, requires the script to be launched through `mpiexec`.
+    """
+    def __init__(self, args):
+
+        super().__init__(args)
+
+        self.comm = MPI.COMM_WORLD
+
+        # Objects are (un)pickled through these functions to keep track of their size at no additional cost
+        def dumps(obj, protocol=None):
+
+            data = pickle.dumps(obj, protocol)
+
+            self.nb_bytes_sent += len(data)
+
+            return data
+
+        def loads(data):
+
+            self.nb_bytes_received += len(data)
+
+            return pickle.loads(data)
+
+        MPI.pickle.__init__(dumps, loads)
+
+    def Get_rank(self):
+
+        return self.comm.Get_rank()
+
+    def Get_size(self):
+
+        return self.comm.Get_size()
+
+    def Get_node_size(self):
+
+        return self.comm.Split_type(MPI.COMM_TYPE_SHARED).Get_size()
+
+    def Scatter(self, sendbuf, recvbuf, root=0):
+
+        if self.comm.Get_rank() == root:
+            self.nb_bytes_sent += sendbuf.nbytes - recvbuf.nbytes
+        else:
+            self.nb_bytes_received += recvbuf.nbytes
+
+        self.comm.Scatter(sendbuf, recvbuf, root=root)
+
+    def Gather(self, sendbuf, recvbuf, root=0):
+
+        if self.comm.Get_rank() == root:
+            self.nb_bytes_received += recvbuf.nbytes - sendbuf.nbytes
+        else:
+            self.nb_bytes_sent += sendbuf.nbytes
+
+        self.comm.Gather(sendbuf, recvbuf, root=root)
+
+    def Allreduce(self, sendbuf, recvbuf):
+
+        self.nb_bytes_sent += sendbuf.nbytes
+        self.nb_bytes_received += recvbuf.nbytes
+
+        self.comm.Allreduce(sendbuf, recvbuf, op=MPI.SUM)
+
+    def scatter(self, sendobj, root=0):
+
+        return self.comm.scatter(sendobj, root=root)
+
+    def gather(self, sendobj, root=0):
+
+        return self.comm.gather(sendobj, root=root)
+
+    def isend(self, obj, dest, tag=0):
+
+        return self.comm.isend(obj, dest=dest, tag=tag)
+
+    def irecv(self, buf=None, source=0, tag=0):
+
+        return self.comm.irecv(buf, source=source, tag=tag)
+
+    def waitall(self, requests):
+
+        return MPI.Request.waitall(requests)
+
+    def Isend(self, buf, dest, tag=0):
+
+        self.nb_bytes_sent += memoryview(buf).nbytes
+
+        return self.comm.Isend(buf, dest=dest, tag=tag)
+
+    def Irecv(self, buf, source=0, tag=0):
+
+        self.nb_bytes_received += memoryview(buf).nbytes
+
+        return self.comm.Irecv(buf, source=source, tag=tag)
+
+    def Waitall(self, requests):
+
+        MPI.Request.Waitall(requests)
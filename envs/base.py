@@ -1,5 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
+import copy
 from importlib import import_module
 import numpy as np
+import queue
+
+from bots.base import BotBatchBase
 
 class EnvBase:
     """
@@ -29,6 +34,11 @@ class EnvBase:
         self.initialize_io(args, rank, size, io_path)
         self.initialize_bots(args, rank, nb_populations)
 
+        self.copies = []
+
+        # Number of emulator steps run so far (for benchmarking), to be incremented by *run* & *run_batch*
+        self.nb_steps = 0
+
     def initialize_io(self, args, rank, size, io_path):
         """
         Called upon object initialization.
@@ -50,6 +60,8 @@ class EnvBase:
 
         for pop_nb in range(self.nb_populations):
             self.bots.append( getattr(import_module(bot_path), 'Bot')(args, rank, pop_nb, nb_populations) )
+
+        self.bot_batch = getattr(import_module(bot_path), 'BotBatch', BotBatchBase)
         
     def build_bots(self, seeds):
         """
@@ -89,12 +101,158 @@ class EnvBase:
         """
         self.setup_to_run()
 
-        fitnesses = self.run(gen_nb) + np.random.rand( len(self.bots) ) * 0.0001
+        fitnesses = self.run(gen_nb) + self.draw_jitter()
 
         self.setup_to_save()
         
         return np.array(fitnesses, dtype=np.float32)
 
+    def draw_jitter(self):
+        """
+        Random jitter to add to the fitnesses of the current bots (breaking ties).
+        Evaluations carried out after those of other bots (threaded or lockstep) need it to be drawn right after the
+        bots' variation, where *evaluate_bots* draws it, for results not to depend on how bots are evaluated.
+        """
+        return np.random.rand( len(self.bots) ) * 0.0001
+
+    def reevaluate_bots(self, gen_nb, fitnesses, nb_reevaluations):
+        """
+        Method called before *evaluate_bots* for bots that have not been mutated since their last evaluation
+        (elites), when `args.elite_trials` >= 0. Their previous fitnesses ought to be carried over and blended with
+        those obtained on `args.elite_trials` fresh trials.
+        Can be implemented, returns None by default (nothing carried over, the bots then being fully evaluated).
+
+        :param gen_nb: Current generation number
+        :type gen_nb: int
+        :param fitnesses: Fitnesses obtained by the bots on their last evaluation
+        :type fitnesses: np.ndarray
+        :param nb_reevaluations: Number of consecutive re-evaluations `fitnesses` already blend (0 : full evaluation)
+        :type nb_reevaluations: int
+        """
+        return None
+
+    def evaluate_bots_batch(self, bots_batch, gen_nb, jitters):
+        """
+        Lockstep counterpart of *evaluate_bots*, evaluating a batch of bots (one list of bots per environment)
+        all at once so that their inference can be batched.
+        Fitnesses can differ from those obtained through *evaluate_bots* in their last bits (batched floating point
+        operations), which can be enough to change the outcome of selection (e.g. in between tied bots).
+
+        :param bots_batch: Batch of bots to evaluate.
+        :type bots_batch: list
+        :param gen_nb: Current generation number
+        :type gen_nb: int
+        :param jitters: Jitters to add to the fitnesses (one row per environment, see *draw_jitter*)
+        :type jitters: np.ndarray
+        """
+        for bots in bots_batch:
+            for bot in bots:
+                bot.setup_to_run()
+
+        fitnesses = self.run_batch(bots_batch, gen_nb) + jitters
+
+        for bots in bots_batch:
+            for bot in bots:
+                bot.setup_to_save()
+
+        return np.array(fitnesses, dtype=np.float32)
+
+    def evaluate_bots_threaded(self, bots_batch, gen_nb, nb_threads, jitters):
+        """
+        Threaded counterpart of *evaluate_bots*, evaluating a batch of bots (one list of bots per environment)
+        on `nb_threads` threads, each of them running its own copy of the environment.
+        Only beneficial if the emulators and/or the bots' inference release the GIL.
+
+        :param bots_batch: Batch of bots to evaluate.
+        :type bots_batch: list
+        :param gen_nb: Current generation number
+        :type gen_nb: int
+        :param nb_threads: Number of threads
+        :type nb_threads: int
+        :param jitters: Jitters to add to the fitnesses (one row per environment, see *draw_jitter*)
+        :type jitters: np.ndarray
+        """
+        while len(self.copies) < nb_threads:
+            self.copies.append( self.copy() )
+
+        envs = queue.Queue()
+
+        for env in self.copies[:nb_threads]:
+            envs.put(env)
+
+        def run(bots):
+
+            env = envs.get()
+
+            try:
+
+                env.bots = bots
+
+                env.setup_to_run()
+
+                fitnesses = env.run(gen_nb)
+
+                env.setup_to_save()
+
+            finally:
+
+                envs.put(env)
+
+            return fitnesses
+
+        with ThreadPoolExecutor(nb_threads) as executor:
+            fitnesses = list( executor.map(run, bots_batch) )
+
+        for env in self.copies:
+            self.nb_steps += env.nb_steps
+            env.nb_steps = 0
+
+        fitnesses = np.array(fitnesses) + jitters
+
+        return np.array(fitnesses, dtype=np.float32)
+
+    def synchronize(self, comm):
+        """
+        Called on all processes once per generation, after their bots' evaluation, to share statistics gathered
+        during the evaluation across processes (e.g. through `comm.Allreduce`).
+        Can be implemented.
+
+        :param comm: Communicator.
+        :type comm: CommBase
+        """
+        pass
+
+    def save(self, gen_nb):
+        """
+        Called on the primary process at every save point to save the environment's own state (e.g. statistics
+        shared across processes) alongside the experiment's state (through *self.io.save_array*).
+        Can be implemented.
+
+        :param gen_nb: Current generation number
+        :type gen_nb: int
+        """
+        pass
+
+    def load(self):
+        """
+        Called on all processes when resuming an experiment to load the environment's own state (through
+        *self.io.load_array*).
+        Can be implemented.
+        """
+        pass
+
+    def copy(self):
+        """
+        Returns a shallow copy of the environment (sharing its arguments and IO object), used to run bots on
+        several threads at once.
+        Should be extended to duplicate the environment's thread-unsafe members (emulators, ...).
+        """
+        env = copy.copy(self)
+
+        env.nb_steps = 0
+
+        return env
+
     def run(self, gen_nb):
         """
         Inner method of *evaluate_bots*.
@@ -104,4 +262,17 @@ class EnvBase:
         :param gen_nb: Current generation number
         :type gen_nb: int
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def run_batch(self, bots_batch, gen_nb):
+        """
+        Inner method of *evaluate_bots_batch*.
+        Should be implemented and made to return the bots' fitnesses as such :
+        % return [[bot_0_0_fitness, ..., bot_0_n_fitness], ..., [bot_m_0_fitness, ..., bot_m_n_fitness]] %
+
+        :param bots_batch: Batch of bots to run.
+        :type bots_batch: list
+        :param gen_nb: Current generation number
+        :type gen_nb: int
+        """
+        raise NotImplementedError
@@ -1,14 +1,16 @@
-import gym
+import numpy as np
 
 from envs.base import EnvBase
-from utils.functions.gym import control_task_name
+from utils.functions.gym import control_task_name, get_info, get_standardization, step
 
 class Env(EnvBase):
 
+    supported_arguments = ['task', 'trials', 'action_repeat', 'normalization']
+
     def __init__(self, args, rank, size):
 
         for key in args.additional_arguments:
-            if key not in ['task', 'trials']:
+            if key not in self.supported_arguments:
                 raise RuntimeError("Control Score does not support `args.additional_arguments['" + key + "']`.")
         
         tasks = ['acrobot', 'cart_pole', 'mountain_car', 'mountain_car_continuous', 'pendulum', 'bipedal_walker',
@@ -27,18 +29,182 @@ class Env(EnvBase):
         elif not isinstance(args.additional_arguments['trials'], int) or args.additional_arguments['trials'] < 1:
             raise RuntimeError("Control Score requires `args.additional_arguments['trials']` >= 1.")
 
+        if 'action_repeat' in args.additional_arguments: # Not set by default to keep the state paths unchanged
+            if not isinstance(args.additional_arguments['action_repeat'], int) or \
+               args.additional_arguments['action_repeat'] < 1:
+                raise RuntimeError("Control Score requires `args.additional_arguments['action_repeat']` >= 1.")
+
+        if 'normalization' in args.additional_arguments: # Not set by default to keep the state paths unchanged
+            if args.additional_arguments['normalization'] not in ['bot', 'shared']:
+                raise RuntimeError("Control Score requires `args.additional_arguments['normalization']` \
+                                    in ['bot', 'shared'].")
+
         super().__init__(args, rank, size)
 
-        task = control_task_name(args.additional_arguments['task'])
+        self.task = control_task_name(args.additional_arguments['task'])
+
+        self.emulator = self.make_emulator()
+
+        self.emulators = [self.emulator]
+
+        self.action_repeat = args.additional_arguments.get('action_repeat', 1)
+
+        # 'bot' : Bots standardize observations with their own running statistics (per-bot state, default)
+        # 'shared' : Observations are standardized by the environment with the statistics of the whole population
+        self.shared_normalization = args.additional_arguments.get('normalization', 'bot') == 'shared'
+
+        if self.shared_normalization:
+
+            d_input = get_info(args.additional_arguments['task'])[0]
+
+            # Statistics (count, sums & sums of squares) of all observations up to the last synchronization and up to
+            # the previous one (those the bots were last evaluated with)
+            self.observation_stats = np.zeros(1 + 2 * d_input)
+            self.evaluation_observation_stats = np.zeros(1 + 2 * d_input)
+
+            self.initialize_new_observation_stats()
+
+            # Fixed between synchronizations
+            self.standardization = get_standardization(self.observation_stats)
+
+    def initialize_new_observation_stats(self):
+        """
+        'shared' normalization : statistics of this process' observations since the last synchronization, accumulated
+        in place (through views of the sums & sums of squares).
+        """
+        d_input = len(self.observation_stats) // 2
+
+        self.new_observation_stats = np.zeros(1 + 2 * d_input)
+
+        self.new_sums = self.new_observation_stats[1:d_input+1]
+        self.new_squared_sums = self.new_observation_stats[d_input+1:]
+
+        self.squared_obs = np.empty(d_input)
+
+    def make_emulator(self):
+        """
+        Create an emulator (the gym environment of the task).
+        """
+        import gym
+
+        return gym.make(self.task)
+
+    def reevaluate_bots(self, gen_nb, fitnesses, nb_reevaluations):
+
+        trials = self.args.additional_arguments['trials']
+        elite_trials = min(self.args.elite_trials, trials)
+
+        if elite_trials == 0:
+            return fitnesses
+
+        self.setup_to_run()
+
+        new_fitnesses = self.run(gen_nb, elite_trials) + np.random.rand( len(self.bots) ) * 0.0001
+
+        self.setup_to_save()
+
+        # The carried over fitness weighs as much as all the trials it was obtained on
+        nb_carried_trials = trials + nb_reevaluations * elite_trials
+
+        fitnesses = (fitnesses * nb_carried_trials + new_fitnesses * elite_trials) / (nb_carried_trials + elite_trials)
+
+        return np.array(fitnesses, dtype=np.float32)
+
+    def standardize(self, obs, mask=None):
+        """
+        'shared' normalization : records observation `obs` (a list of observations, recorded where `mask` is True, when
+        running bots in lockstep) and standardizes it with the statistics shared by all processes.
+        """
+        if not self.shared_normalization:
+            return obs
+
+        if mask is None: # Single observation (every step) : accumulated in place
+
+            self.new_observation_stats[0] += 1
+
+            np.add(self.new_sums, obs, out=self.new_sums)
+            np.multiply(obs, obs, out=self.squared_obs, dtype=np.float64)
+            np.add(self.new_squared_sums, self.squared_obs, out=self.new_squared_sums)
+
+            return (obs - self.standardization[0]) * self.standardization[1]
+
+        obs = np.array(obs, dtype=np.float64)
+
+        recorded_obs = obs[mask]
+
+        self.new_observation_stats[0] += len(recorded_obs)
+
+        np.add(self.new_sums, recorded_obs.sum(0), out=self.new_sums)
+        np.add(self.new_squared_sums, np.square(recorded_obs).sum(0), out=self.new_squared_sums)
+
+        return (obs - self.standardization[0]) * self.standardization[1]
+
+    def synchronize(self, comm):
+
+        if not self.shared_normalization:
+            return
+
+        for env in self.copies: # Threaded evaluations
+            self.new_observation_stats += env.new_observation_stats
+            env.new_observation_stats[:] = 0
 
-        self.emulator = gym.make(task)
+        new_observation_stats = np.empty_like(self.new_observation_stats)
 
-    def run(self, gen_nb):
+        comm.Allreduce(self.new_observation_stats, new_observation_stats)
+
+        self.evaluation_observation_stats[:] = self.observation_stats
+
+        self.observation_stats += new_observation_stats
+        self.new_observation_stats[:] = 0
+
+        # In place, as shared with the copies
+        self.standardization[:] = get_standardization(self.observation_stats)
+
+    def save(self, gen_nb):
+
+        if self.shared_normalization:
+
+            # Resumed from
+            self.io.save_array(self.observation_stats, 'observation_statistics', gen_nb)
+
+            # Applied by the tools (`utils/evaluate.py`, ...) to the saved bots
+            self.io.save_array(self.evaluation_observation_stats, 'evaluation_observation_statistics', gen_nb)
+
+    def load(self):
+
+        if not self.shared_normalization:
+            return
+
+        observation_stats = self.io.load_array('observation_statistics')
+
+        if observation_stats is None:
+            raise RuntimeError("No observation statistics found, required by 'shared' normalization.")
+
+        self.observation_stats[:] = observation_stats
+        self.standardization[:] = get_standardization(self.observation_stats)
+
+    def copy(self):
+
+        env = super().copy()
+
+        if self.shared_normalization:
+            env.initialize_new_observation_stats()
+
+        env.emulator = self.make_emulator()
+
+        env.emulators = [env.emulator]
+
+        return env
+
+    def run(self, gen_nb, nb_trials=None):
+
+        if nb_trials == None:
+            nb_trials = self.args.additional_arguments['trials']
 
         [bot] = self.bots
         bot_fitness = 0
 
-        for i in range(self.args.additional_arguments['trials']):
+        for i in range(nb_trials):
 
             self.emulator.seed(gen_nb * self.args.additional_arguments['trials'] + i)
             obs = self.emulator.reset()
@@ -46,12 +212,52 @@ class Env(EnvBase):
 
             while not done:
 
-                obs, rew, done, _ = self.emulator.step( bot(obs) )
+                obs, rew, done, _, nb_steps = step(self.emulator, bot(self.standardize(obs)), self.action_repeat)
                 
                 bot_fitness += rew
 
+                self.nb_steps += nb_steps
+
             bot.reset()
 
-        bot_fitness /= self.args.additional_arguments['trials']
+        bot_fitness /= nb_trials
+
+        return [bot_fitness]
+
+    def run_batch(self, bots_batch, gen_nb):
+
+        bots = [bot for [bot] in bots_batch]
+        bot_batch = self.bot_batch(bots)
+        bots_fitnesses = np.zeros(len(bots))
+
+        while len(self.emulators) < len(bots):
+            self.emulators.append( self.make_emulator() )
+
+        for i in range(self.args.additional_arguments['trials']):
+
+            obs = []
+
+            for emulator in self.emulators[:len(bots)]:
+                emulator.seed(gen_nb * self.args.additional_arguments['trials'] + i)
+                obs.append( emulator.reset() )
+
+            running = np.ones(len(bots), dtype=bool)
+
+            while running.any():
+
+                actions = bot_batch(self.standardize(obs, running), running)
+
+                for j in np.where(running)[0]:
+
+                    obs[j], rew, done, _, nb_steps = step(self.emulators[j], actions[j], self.action_repeat)
+
+                    bots_fitnesses[j] += rew
+                    running[j] = not done
+
+                    self.nb_steps += nb_steps
+
+            bot_batch.reset()
+
+        bots_fitnesses /= self.args.additional_arguments['trials']
 
-        return [bot_fitness]
\ No newline at end of file
+        return bots_fitnesses[:, None]
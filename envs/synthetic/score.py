@@ -0,0 +1,120 @@
+import numpy as np
+
+from envs.control.score import Env as ControlEnv
+from utils.functions.gym import get_info
+
+class Emulator:
+    """
+    Synthetic, pure NumPy, emulator (gym API) imitating a control task's observation & action spaces.
+    Its hidden state evolves through a fixed random recurrent map driven by the actions. Rewards are given for
+    actions matching a fixed random readout of the hidden state.
+
+    :param task: Control task whose observation & action dimensions are imitated.
+    :type task: string
+    :param episode_length: Mean episode length.
+    :type episode_length: int
+    :param episode_length_distribution: 'fixed', 'uniform' (in [1, 2 * episode_length - 1]) or 'geometric'.
+    :type episode_length_distribution: string
+    :param step_cost: Number of hidden units on top of the observed ones (the cost of a step grows quadratically).
+    :type step_cost: int
+    """
+    def __init__(self, task, episode_length, episode_length_distribution, step_cost):
+
+        self.d_input, self.d_output, self.discrete_output, self.output_range = get_info(task)
+
+        self.episode_length = episode_length
+        self.episode_length_distribution = episode_length_distribution
+
+        d_hidden = self.d_input + step_cost
+
+        # Same dynamics for all emulators
+        rng = np.random.RandomState(0)
+
+        self.recurrent_weights = rng.randn(d_hidden, d_hidden) / np.sqrt(d_hidden)
+        self.action_weights = rng.randn(d_hidden, self.d_output)
+        self.readout_weights = rng.randn(self.d_output, d_hidden) / np.sqrt(d_hidden)
+
+        self.rng = np.random.RandomState()
+
+    def seed(self, seed):
+
+        self.rng = np.random.RandomState(seed)
+
+    def reset(self):
+
+        if self.episode_length_distribution == 'fixed':
+            self.length = self.episode_length
+        elif self.episode_length_distribution == 'uniform':
+            self.length = self.rng.randint(1, 2 * self.episode_length)
+        else: # self.episode_length_distribution == 'geometric':
+            self.length = self.rng.geometric(1 / self.episode_length)
+
+        self.t = 0
+
+        self.hidden = self.rng.randn(len(self.recurrent_weights))
+
+        return self.hidden[:self.d_input].copy()
+
+    def step(self, action):
+
+        target = np.tanh(self.readout_weights @ self.hidden)
+
+        if self.discrete_output:
+
+            rew = float(action == target.argmax())
+
+            action = np.eye(self.d_output)[action]
+
+        else:
+
+            action = np.clip(action, -self.output_range, self.output_range) / self.output_range
+
+            rew = 1 - np.mean((action - target) ** 2)
+
+        self.hidden = np.tanh(self.recurrent_weights @ self.hidden + self.action_weights @ action)
+
+        self.t += 1
+
+        return self.hidden[:self.d_input].copy(), rew, self.t >= self.length, {}
+
+    def close(self):
+
+        pass
+
+class Env(ControlEnv):
+    """
+    Synthetic counterpart of the control environment (envs/control/score.py) : same tasks (observation & action
+    dimensions), trials and bots but no gym dependency.
+    Meant to benchmark the evolution, communication protocols & bots' inference independently of the emulators.
+    """
+    supported_arguments = ControlEnv.supported_arguments + ['episode_length', 'episode_length_distribution',
+                                                            'step_cost']
+
+    def __init__(self, args, rank, size):
+
+        if 'episode_length' not in args.additional_arguments:
+            args.additional_arguments['episode_length'] = 200
+        elif not isinstance(args.additional_arguments['episode_length'], int) or \
+             args.additional_arguments['episode_length'] < 1:
+            raise RuntimeError("Synthetic Score requires `args.additional_arguments['episode_length']` >= 1.")
+
+        if 'episode_length_distribution' not in args.additional_arguments:
+            args.additional_arguments['episode_length_distribution'] = 'fixed'
+        elif args.additional_arguments['episode_length_distribution'] not in ['fixed', 'uniform', 'geometric']:
+            raise RuntimeError("Synthetic Score requires `args.additional_arguments['episode_length_distribution']` \
+                                in ['fixed', 'uniform', 'geometric'].")
+
+        if 'step_cost' not in args.additional_arguments:
+            args.additional_arguments['step_cost'] = 0
+        elif not isinstance(args.additional_arguments['step_cost'], int) or \
+             args.additional_arguments['step_cost'] < 0:
+            raise RuntimeError("Synthetic Score requires `args.additional_arguments['step_cost']` >= 0.")
+
+        super().__init__(args, rank, size)
+
+    def make_emulator(self):
+
+        return Emulator(self.args.additional_arguments['task'],
+                        self.args.additional_arguments['episode_length'],
+                        self.args.additional_arguments['episode_length_distribution'],
+                        self.args.additional_arguments['step_cost'])
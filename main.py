@@ -7,18 +7,20 @@ and the various MPI-powered communication events that ought to take place during
 """
 import argparse
 import copy
+import json
 import numpy as np
+import os
 import pickle
-import sys
 import time
 import warnings
-from mpi4py import MPI
 
-from utils.functions.misc import initialize_environment
+from utils.functions.misc import initialize_communication, initialize_environment, set_nb_intra_op_threads
+from utils.functions.monitor import Monitor, summarize_bot_stats
+from utils.functions.population import PopulationStore, gather_pickled
+from utils.functions.profiling import Profiler, clear_profiles, summarize
 
 np.set_printoptions(suppress=True)
 warnings.filterwarnings('ignore')
-sys.setrecursionlimit(2**31-1)
 
 parser = argparse.ArgumentParser()
 
@@ -42,6 +44,12 @@ parser.add_argument('--elitism', '-t', type=float, default=0,
                     help="Proportion (if float in [0, 0.5]) or number (if int in [0, 0.5*pop_size]) of the \
                           best performing bots which will not be mutated each generation.")
 
+parser.add_argument('--elite_trials', '-r', type=int, default=-1,
+                    help="Number of fresh trials (int in [-1, trials]) on which to re-evaluate unmutated elites. \
+                          Their previous fitness is carried over and blended with that of the fresh trials. \
+                          -1 : full re-evaluation. 0 : previous fitness carried over as is. \
+                          (each bot's number of consecutive re-evaluations is saved as carried.npy)")
+
 parser.add_argument('--save_frequency', '-f', type=int, default=0,
                     help="Frequency (int in [0, nb_generations]) at which to save the experiment's state.")
 
@@ -52,6 +60,67 @@ parser.add_argument('--communication', '-c', choices=['ps', 'ps_p2p', 'big_ps_p2
                                        (the number of MPI processes must remain constant for successive experiments) \
                           All protocols must remain constant across successive experiments.")
 
+parser.add_argument('--state_layout', '-s', choices=['pickle', 'indexed', 'deduplicated'], default='pickle',
+                    help="pickle : Each process' state is saved as a single pickle file. \
+                          indexed : Bots are saved one by one and indexed, for tools (`utils/evaluate.py`, \
+                                    `utils/record.py`) to only load the bots they need ('ps_p2p' and 'big_ps_p2p'). \
+                          deduplicated : indexed + bots are saved into a content-addressed store shared by all \
+                                         generations, unchanged bots (e.g. elites) only being written once, states \
+                                         then only listing their bots' hashes & running states (e.g. observation \
+                                         statistics, updated whenever a bot is run) (see `utils/thin_states.py`). \
+                          States saved with any layout can be loaded.")
+
+parser.add_argument('--lockstep', '-k', type=int, default=0,
+                    help="Evaluates all of a process' bots in lockstep, batching their inference. \
+                          (batched floating point operations can change the last bits of fitnesses compared to the \
+                          default one-bot-at-a-time evaluation, which can be enough to change selection between tied \
+                          bots, hence results)")
+
+parser.add_argument('--nb_threads', '-j', type=int, default=1,
+                    help="Number of threads on which each process evaluates its bots (each thread running its own \
+                          emulator). Only beneficial if emulators and/or bots' inference release the GIL. \
+                          PyTorch's intra-op threads are limited so as not to oversubscribe the node's cores. \
+                          Results do not depend on the number of threads. (ignored if `--lockstep` is set)")
+
+parser.add_argument('--backend', '-m', choices=['mpi', 'local'], default='mpi',
+                    help="mpi : Processes are launched through `mpiexec`. \
+                          local : `--nb_processes` processes are forked on this machine (no MPI installation needed). \
+                          Both backends produce identical results.")
+
+parser.add_argument('--nb_processes', '-n', type=int, default=1,
+                    help="Number of processes to fork (only with `--backend local`).")
+
+parser.add_argument('--stats_path', '-x', type=str, default=None,
+                    help="Path to a JSON file in which to write the run's statistics (generations/s, env steps/s, \
+                          bytes sent, startup time & peak RSS of each process) for benchmarking purposes.")
+
+parser.add_argument('--monitor', '-w', type=int, default=1,
+                    help="Logs per-process phase timings & counters (env steps, bytes sent/received, pickled bot \
+                          sizes) every generation to data/states/<...>/<population_size>/monitor.jsonl, along with \
+                          the processes' startup timings on the first generation.")
+
+parser.add_argument('--profile', '-z', type=int, nargs='*', default=None,
+                    help="Profiles (cProfile) the processes of the given ranks (all processes if no rank is given). \
+                          Profiles are dumped into data/states/<...>/<population_size>/profiles/<nb_elapsed_generations>/ \
+                          and merged into a summary of the hottest functions (summary.txt).")
+
+parser.add_argument('--profile_generations', '-y', type=int, nargs='+', default=None,
+                    help="Generations to profile (all generations by default).")
+
+parser.add_argument('--plan_cache_size', '-o', type=int, default=0,
+                    help="Dynamic bots (bots/dynamic/rnn) only. Number of compiled forward plans (one per net topology) \
+                          to cache per process, nets sharing a cached topology reuse its plan and only swap their \
+                          parameters in. Plans run vectorized, hence slightly differ in floating point from the \
+                          default node by node inference (0 : disabled).")
+
+parser.add_argument('--memory_budget', '-q', type=float, default=None,
+                    help="'ps_p2p' and 'big_ps_p2p' only. RAM budget (in MB) of each process' idle bots, kept pickled \
+                          in RAM up to the budget and spilled to local files (system's temporary directory) beyond \
+                          it. Bots are paged in when varied & evaluated (the next one being read from its spill \
+                          file in the background) and streamed, within the budget, when exchanged between processes \
+                          & saved (one at a time with the 'indexed' & 'deduplicated' state layouts, the 'pickle' one \
+                          requiring all of them to be unpickled). (None : all bots kept unpickled in RAM)")
+
 parser.add_argument('--enable_gpu_use', '-u', type=int, default=0,
                     help="Makes use of GPUs if they are available.")
 
@@ -60,11 +129,24 @@ parser.add_argument('--additional_arguments', '-a', type=str, default='{}',
 
 args = parser.parse_args()
 
-comm = MPI.COMM_WORLD
+startup_start = time.perf_counter()
+
+comm = initialize_communication(args)
 rank = comm.Get_rank()
 size = comm.Get_size()
 
-env = initialize_environment(args, rank, size)
+communication_initialized = time.perf_counter()
+
+env = initialize_environment(args, rank, size) # Imports the bots' & emulators' dependencies
+
+environment_initialized = time.perf_counter()
+
+if args.nb_threads > 1:
+
+    nb_node_processes = comm.Get_node_size()
+
+    set_nb_intra_op_threads( max(1, os.cpu_count() // (nb_node_processes * args.nb_threads)) )
+
 old_nb_gen = args.nb_elapsed_generations
 new_nb_gen = args.nb_generations
 pop_size = args.population_size
@@ -75,11 +157,18 @@ ps_p2p_comm = args.communication == 'ps_p2p'
 big_ps_p2p_comm = args.communication == 'big_ps_p2p'
 p2p_comm = args.communication == 'ps_p2p' or args.communication == 'big_ps_p2p'
 
+out_of_core = p2p_comm and args.memory_budget != None
+
+memory_budget = int(args.memory_budget * 2**20) if out_of_core else None
+
 full_seed_list = None
 fitnesses = None
+carried = None
+full_bot_stats_list = None
 
 full_seed_list_batch = np.empty((batch_size, 1, 1), dtype=np.uint32)
 fitnesses_batch = np.empty((batch_size, 1), dtype=np.float32)
+carried_batch = np.zeros((batch_size, 1), dtype=np.float32) # Number of consecutive re-evaluations (0 : none)
 
 if p2p_comm:
 
@@ -87,21 +176,23 @@ if p2p_comm:
     pairing_and_seeds = None
     fitnesses_and_bot_sizes = None
 
-    bots_batch = []
+    bots_batch = PopulationStore(memory_budget) if out_of_core else []
 
-    # [MPI buffer size, pair position, sending, seed]
-    pairing_and_seeds_batch = np.empty((batch_size, 1, 4), dtype=np.uint32)
+    # [pair position, sending, seed]
+    pairing_and_seeds_batch = np.empty((batch_size, 1, 3), dtype=np.uint32)
 
-    # [fitness, pickled bot size]
-    fitnesses_and_bot_sizes_batch = np.empty((batch_size, 1, 2), dtype=np.float32) 
+    # [fitness, pickled bot size, fitness carried over]
+    fitnesses_and_bot_sizes_batch = np.zeros((batch_size, 1, 3), dtype=np.float32)
 
 if rank == 0:
 
     fitnesses = np.empty((pop_size, 1), dtype=np.float32) 
 
-    pairing_and_seeds = np.empty((pop_size, 1, 4), dtype=np.uint32) 
+    carried = np.zeros((pop_size, 1), dtype=np.float32)
 
-    fitnesses_and_bot_sizes = np.empty((pop_size, 1, 2), dtype=np.float32)
+    pairing_and_seeds = np.empty((pop_size, 1, 3), dtype=np.uint32) 
+
+    fitnesses_and_bot_sizes = np.empty((pop_size, 1, 3), dtype=np.float32)
 
     if old_nb_gen > 0:
 
@@ -111,6 +202,8 @@ if rank == 0:
 
             full_seed_list, full_fitness_list, latest_fitnesses = state
 
+            fitnesses[:] = latest_fitnesses
+
             fitnesses_sorting_indices = latest_fitnesses.argsort(axis=0)
 
         else: # p2p_comm:
@@ -120,24 +213,32 @@ if rank == 0:
             else: # big_ps_p2p_comm:
                 full_seed_list, full_fitness_list, latest_fitnesses_and_bot_sizes, bots_batch = state
 
+            fitnesses[:] = latest_fitnesses_and_bot_sizes[:, :, 0]
+
             fitnesses_sorting_indices = latest_fitnesses_and_bot_sizes[:, :, 0].argsort(axis=0)
 
         fitnesses_rankings = fitnesses_sorting_indices.argsort(axis=0)
 
+        full_carried_list = env.io.load_array('carried')
+
+        if full_carried_list is None:
+            full_carried_list = np.zeros((pop_size, 1, old_nb_gen), dtype=np.float32)
+
+        carried[:] = full_carried_list[:, :, -1]
+
+        full_bot_stats_list = env.io.load_array('bot_stats')
+
     else: # old_nb_gen == 0:
 
         full_seed_list = np.empty((pop_size, 1, 0), dtype=np.uint32)
         full_fitness_list = np.empty((pop_size, 1, 0), dtype=np.float32)
+        full_carried_list = np.empty((pop_size, 1, 0), dtype=np.float32)
 
 if old_nb_gen > 0:
 
     if ps_p2p_comm:
 
         if rank == 0:
-
-            for i in range(pop_size):
-                fitnesses_and_bot_sizes[i, 0, 1] = len( pickle.dumps(bots[i][0]) )
-
             bots = [ bots[i * batch_size: (i+1) * batch_size] for i in range(size) ]
 
         bots_batch = comm.scatter(bots, root=0)
@@ -147,13 +248,47 @@ if old_nb_gen > 0:
         if rank != 0:
             [bots_batch] = env.io.load_state()
 
-        for i in range(batch_size):
-            fitnesses_and_bot_sizes_batch[i, 0, 1] = len( pickle.dumps(bots_batch[i][0]) )
+    if out_of_core: # Paged out
 
-        comm.Gather(fitnesses_and_bot_sizes_batch, fitnesses_and_bot_sizes, root=0)
+        bots_list, bots_batch = bots_batch, PopulationStore(memory_budget)
+
+        for bots in bots_list:
+            bots_batch.append(bots)
+
+        del bots_list
+
+    if args.elite_trials >= 0: # Previous fitnesses of the elites, to be carried over
+
+        comm.Scatter(fitnesses, fitnesses_batch, root=0)
+        comm.Scatter(carried, carried_batch, root=0)
+
+    env.load() # The environment's own state (e.g. statistics shared across processes)
+
+monitor = Monitor(comm, env, rank, env.io.path + str(pop_size) + '/monitor.jsonl' if args.monitor else None)
+
+# Launch overhead, logged along the first generation
+monitor.time('startup_communication', communication_initialized - startup_start)
+monitor.time('startup_environment', environment_initialized - communication_initialized)
+monitor.time('startup_state', time.perf_counter() - environment_initialized)
+
+profiles_path = env.io.path + str(pop_size) + '/profiles/' + str(old_nb_gen) + '/'
+
+profiler = Profiler(rank, args.profile, profiles_path)
+
+if rank == 0 and args.profile != None: # Profiles of previous runs are not to be merged with this run's
+    clear_profiles(profiles_path)
+
+startup_time = time.perf_counter() - startup_start
+
+run_start = time.time()
 
 for gen_nb in range(old_nb_gen, old_nb_gen + new_nb_gen):
 
+    if args.profile_generations == None or gen_nb in args.profile_generations:
+        profiler.start()
+
+    monitor.phase('seeds')
+
     np.random.seed(gen_nb)
 
     if rank == 0:
@@ -167,6 +302,8 @@ for gen_nb in range(old_nb_gen, old_nb_gen + new_nb_gen):
         if gen_nb != 0:
             full_seed_list[:, 0] = full_seed_list[:, 0][ fitnesses_rankings[:, 0] ]
 
+    monitor.phase('scatter')
+
     if ps_comm or gen_nb == 0:
 
         full_seed_list_batch = np.empty((batch_size, 1, gen_nb + 1), dtype=np.uint32)
@@ -177,76 +314,185 @@ for gen_nb in range(old_nb_gen, old_nb_gen + new_nb_gen):
 
         if rank == 0:
 
-            pairing_and_seeds[:, :, 0] = np.max(fitnesses_and_bot_sizes[:, :, 1]) # MPI buffer size
-
             pair_ranking = (fitnesses_rankings[:, 0] + pop_size // 2) % pop_size
 
-            pairing_and_seeds[:, 0, 1] = fitnesses_sorting_indices[:,0][pair_ranking] # pair position
+            pairing_and_seeds[:, 0, 0] = fitnesses_sorting_indices[:,0][pair_ranking] # pair position
 
-            pairing_and_seeds[:, :, 2] = np.greater_equal(fitnesses_rankings, pop_size // 2) # sending
+            pairing_and_seeds[:, :, 1] = np.greater_equal(fitnesses_rankings, pop_size // 2) # sending
 
-            pairing_and_seeds[:, :, 3] = full_seed_list[:, :, -1] # seed
+            pairing_and_seeds[:, :, 2] = full_seed_list[:, :, -1] # seed
 
         comm.Scatter(pairing_and_seeds, pairing_and_seeds_batch, root=0)
 
-        req = []
+        monitor.phase('exchange')
+
+        sends = []
+        receives = []
 
         for i in range(batch_size):
 
-            pair = int(pairing_and_seeds_batch[i, 0, 1] // batch_size)
+            pair = int(pairing_and_seeds_batch[i, 0, 0] // batch_size)
 
-            if pairing_and_seeds_batch[i, 0, 2] == 1: # sending
+            if pairing_and_seeds_batch[i, 0, 1] == 1: # sending
 
                 tag = int(pop_size * 0 + batch_size * rank + i)
 
-                req.append( comm.isend(bots_batch[i][0], dest=pair, tag=tag) )
+                if out_of_core: # Pickled entries sent as is
+                    get_pickled_bots = lambda i=i: bots_batch.get_pickled(i)
+                else:
+                    get_pickled_bots = lambda i=i: pickle.dumps(bots_batch[i][0], protocol=pickle.HIGHEST_PROTOCOL)
 
-            else: # pairing_and_seeds_batch[i, 0, 2] == 0: # receiving
+                sends.append( (get_pickled_bots, pair, tag) )
 
-                tag = int(pop_size * 0 + pairing_and_seeds_batch[i, 0, 1])
+            else: # pairing_and_seeds_batch[i, 0, 1] == 0: # receiving
 
-                req.append( comm.irecv(pairing_and_seeds_batch[i, 0, 0], source=pair, tag=tag) )
+                tag = int(pop_size * 0 + pairing_and_seeds_batch[i, 0, 0])
 
-        received_bots = MPI.Request.waitall(req)
+                if out_of_core:
+                    set_pickled_bots = lambda pickled_bots, i=i: bots_batch.set_pickled(i, pickled_bots)
+                else:
+                    set_pickled_bots = lambda pickled_bot, i=i: bots_batch.__setitem__(i, [pickle.loads(pickled_bot)])
 
-        for i, bot in enumerate(received_bots):
-            if bot is not None:
-                bots_batch[i // 1][i % 1] = bot
+                receives.append( (set_pickled_bots, pair, tag) )
+
+        # Pickled bots of any size, streamed in chunks (out of core : only pickled as they are sent, within the budget)
+        comm.exchange(sends, receives, max_nb_bytes=memory_budget)
+
+    batch_indices = []
+    batch_bots = []
+    batch_jitters = []
+    bot_stats_batch = []
 
     for i in range(batch_size):
 
+        monitor.phase('variation')
+
         if ps_comm or gen_nb == 0:
 
+            seeds = full_seed_list_batch[i, :, -1]
+
+            if args.lockstep or args.nb_threads > 1: # Bots evaluated together need to be distinct objects
+                env.initialize_bots(args, rank, env.nb_populations)
+
             env.build_bots(full_seed_list_batch[i]) # Variations from scratch
 
         else:
 
+            seeds = pairing_and_seeds_batch[i, :, 2]
+
             env.bots = bots_batch[i]
-            env.extend_bots(pairing_and_seeds_batch[i, :, 3]) # Variation
 
-        fitnesses_batch[i] = env.evaluate_bots(gen_nb) # Evaluation
+            if out_of_core:
+                bots_batch.prefetch(i + 1) # Read while the current bots are varied & evaluated
 
-        if p2p_comm:
+            env.extend_bots(seeds) # Variation
+
+        bot_stats_batch.append( [bot.get_stats() for bot in env.bots] )
+
+        monitor.phase('evaluation')
+
+        carried_fitnesses = None
 
-            if gen_nb == 0:
-                bots_batch.append( copy.deepcopy(env.bots) )
+        if args.elite_trials >= 0 and gen_nb > 0 and np.all(seeds == 0):
+            carried_fitnesses = env.reevaluate_bots(gen_nb, fitnesses_batch[i], int(carried_batch[i, 0])) # Elites
+
+        carried_batch[i] = carried_batch[i] + 1 if carried_fitnesses is not None else 0
+
+        if carried_fitnesses is not None:
+            fitnesses_batch[i] = carried_fitnesses # Partial evaluation
+        elif args.lockstep or args.nb_threads > 1:
+            batch_indices.append(i)
+            batch_bots.append(env.bots)
+            batch_jitters.append(env.draw_jitter()) # Drawn in evaluation order, as *evaluate_bots* does
+        else:
+            fitnesses_batch[i] = env.evaluate_bots(gen_nb) # Evaluation
+
+        if p2p_comm and gen_nb == 0:
+            bots_batch.append( env.bots if args.lockstep or args.nb_threads > 1 or out_of_core
+                               else copy.deepcopy(env.bots) )
+        elif out_of_core and i not in batch_indices:
+            bots_batch[i] = env.bots # Paged out
+
+    if len(batch_bots) > 0:
+
+        if args.lockstep:
+            fitnesses_batch[batch_indices] = env.evaluate_bots_batch(batch_bots, gen_nb, np.array(batch_jitters))
+        else:
+            fitnesses_batch[batch_indices] = env.evaluate_bots_threaded(batch_bots, gen_nb, args.nb_threads,
+                                                                        np.array(batch_jitters))
+
+        if out_of_core:
+            for i, bots in zip(batch_indices, batch_bots):
+                bots_batch[i] = bots # Paged out once evaluated
+
+    monitor.phase('synchronization')
+
+    env.synchronize(comm)
+
+    monitor.phase('bot_sizes')
+
+    if p2p_comm:
+
+        for i in range(batch_size):
 
             fitnesses_and_bot_sizes_batch[i, :, 0] = fitnesses_batch[i]
 
-            fitnesses_and_bot_sizes_batch[i, 0, 1] = len(pickle.dumps(bots_batch[i][0]))
+            fitnesses_and_bot_sizes_batch[i, :, 2] = carried_batch[i]
+
+            if out_of_core:
+                bot_size = bots_batch.get_size(i)
+            else:
+                bot_size = len(pickle.dumps(bots_batch[i][0]))
+
+            fitnesses_and_bot_sizes_batch[i, 0, 1] = bot_size # Informative only (transfers exchange exact sizes)
+
+            monitor.count('nb_pickled_bot_bytes', bot_size)
     
+    monitor.phase('gather')
+
     if ps_comm:
 
         comm.Gather(fitnesses_batch, fitnesses, root=0)
 
+        if args.elite_trials >= 0:
+            comm.Gather(carried_batch, carried, root=0)
+
     else: # p2p_comm:
 
         comm.Gather(fitnesses_and_bot_sizes_batch, fitnesses_and_bot_sizes, root=0)
 
+    if len(bot_stats_batch[0][0]) > 0: # Structural statistics of the bots
+
+        monitor.phase('bot_stats')
+
+        bot_stats_names = sorted(bot_stats_batch[0][0])
+
+        bot_stats_batch = np.array([[[bot_stats[name] for name in bot_stats_names] for bot_stats in bots_stats]
+                                    for bots_stats in bot_stats_batch], dtype=np.float32)
+
+        bot_stats = np.empty((pop_size,) + bot_stats_batch.shape[1:], dtype=np.float32) if rank == 0 else None
+
+        comm.Gather(bot_stats_batch, bot_stats, root=0)
+
+        if rank == 0:
+
+            monitor.record('bot_stats', summarize_bot_stats(bot_stats, bot_stats_names))
+
+            # Saved as a structured array (one field per statistic)
+            bot_stats = np.rec.fromarrays(np.moveaxis(bot_stats, -1, 0), names=bot_stats_names)
+
+            if full_bot_stats_list is None:
+                full_bot_stats_list = np.zeros((pop_size, 1, gen_nb), dtype=bot_stats.dtype)
+
+            full_bot_stats_list = np.concatenate((full_bot_stats_list, bot_stats[:, :, None]), 2)
+
+    monitor.phase('selection')
+
     if rank == 0:
 
         if p2p_comm:
             fitnesses = fitnesses_and_bot_sizes[:, :, 0]
+            carried = fitnesses_and_bot_sizes[:, :, 2]
 
         fitnesses_sorting_indices = fitnesses.argsort(axis=0)
         fitnesses_rankings = fitnesses_sorting_indices.argsort(axis=0)
@@ -258,17 +504,37 @@ for gen_nb in range(old_nb_gen, old_nb_gen + new_nb_gen):
         print(gen_nb + 1, ':', int( time.time() - start ), '\n', np.mean(fitnesses, 0), '\n', np.max(fitnesses, 0) )
 
         full_fitness_list = np.concatenate((full_fitness_list, fitnesses[:, :, None]), 2)
+        full_carried_list = np.concatenate((full_carried_list, carried[:, :, None]), 2)
+
+    monitor.phase('save')
 
     if gen_nb + 1 in env.io.save_points:
+
+        if rank == 0 and args.elite_trials >= 0:
+            env.io.save_array(full_carried_list, 'carried', gen_nb + 1)
+
+        if rank == 0 and full_bot_stats_list is not None:
+            env.io.save_array(full_bot_stats_list, 'bot_stats', gen_nb + 1)
+
+        if rank == 0:
+            env.save(gen_nb + 1)
         
         if ps_comm:
 
             if rank == 0:
                 env.io.save_state([full_seed_list, full_fitness_list, fitnesses], gen_nb + 1)
 
-        if ps_p2p_comm:
+        if ps_p2p_comm and out_of_core: # Pickled bots streamed to process 0 & saved one at a time
+
+            pickled_bots = gather_pickled(comm, bots_batch, memory_budget)
+
+            if rank == 0:
+                env.io.save_state([full_seed_list, full_fitness_list, fitnesses_and_bot_sizes, pickled_bots],
+                                  gen_nb + 1, fitnesses, pickled=True)
+
+        elif ps_p2p_comm:
             
-            batched_bots = comm.gather(bots_batch, root=0)
+            batched_bots = comm.gather(list(bots_batch), root=0)
 
             if rank == 0:
                 
@@ -277,11 +543,63 @@ for gen_nb in range(old_nb_gen, old_nb_gen + new_nb_gen):
                 for bot_batch in batched_bots:
                     bots = bots + bot_batch
 
-                env.io.save_state([full_seed_list, full_fitness_list, fitnesses_and_bot_sizes, bots], gen_nb + 1)
+                env.io.save_state([full_seed_list, full_fitness_list, fitnesses_and_bot_sizes, bots], gen_nb + 1,
+                                  fitnesses)
+
+        if big_ps_p2p_comm and out_of_core: # Pickled bots saved one at a time
 
-        if big_ps_p2p_comm:
+            if rank == 0:
+                env.io.save_state([full_seed_list, full_fitness_list, fitnesses_and_bot_sizes,
+                                   bots_batch.iterate_pickled()], gen_nb + 1, fitnesses_batch, pickled=True)
+            else: # rank != 0:
+                env.io.save_state([bots_batch.iterate_pickled()], gen_nb + 1, fitnesses_batch, pickled=True)
+
+        elif big_ps_p2p_comm:
 
             if rank == 0:
-                env.io.save_state([full_seed_list, full_fitness_list, fitnesses_and_bot_sizes, bots_batch], gen_nb + 1)
+                env.io.save_state([full_seed_list, full_fitness_list, fitnesses_and_bot_sizes, list(bots_batch)],
+                                  gen_nb + 1, fitnesses_batch)
             else: # rank != 0:
-                env.io.save_state([bots_batch], gen_nb + 1)
\ No newline at end of file
+                env.io.save_state([list(bots_batch)], gen_nb + 1, fitnesses_batch)
+
+    monitor.log(gen_nb + 1)
+
+    profiler.stop()
+
+if args.profile != None:
+
+    profiler.dump()
+
+    comm.gather(None, root=0) # Waits for all profiles to be dumped
+
+    if rank == 0:
+        summarize(profiles_path)
+
+if args.stats_path != None:
+
+    import resource
+
+    elapsed_time = time.time() - run_start
+
+    process_stats = {'rank': rank,
+                     'nb_steps': env.nb_steps,
+                     'nb_bytes_sent': comm.nb_bytes_sent,
+                     'startup_time': startup_time,
+                     'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024} # Linux : kB
+
+    processes_stats = comm.gather(process_stats, root=0)
+
+    if rank == 0:
+
+        nb_steps = sum([stats['nb_steps'] for stats in processes_stats])
+
+        stats = {'nb_generations': new_nb_gen,
+                 'elapsed_time': elapsed_time,
+                 'generations_per_second': new_nb_gen / elapsed_time,
+                 'steps_per_second': nb_steps / elapsed_time,
+                 'nb_steps': nb_steps,
+                 'nb_bytes_sent': sum([stats['nb_bytes_sent'] for stats in processes_stats]),
+                 'processes': processes_stats}
+
+        with open(args.stats_path, 'w') as f:
+            json.dump(stats, f, indent=4)
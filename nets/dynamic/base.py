@@ -49,6 +49,13 @@ class DynamicNetBase:
         """
         pass
 
+    def get_stats(self):
+        """
+        Structural statistics of the net, returned as a dictionary of numbers (e.g. {'nb_nodes' : 10}).
+        Can be either implemented or left blank if this function is not desired.
+        """
+        return {}
+
     def __call__(self, x):
         """
         Run net for one timestep given input 'x'.
@@ -1,4 +1,6 @@
+import collections
 import numpy as np
+import threading
 
 from nets.dynamic.base import DynamicNetBase
 from utils.functions.misc import deterministic_set, find_sublist_index, list_dict
@@ -31,6 +33,8 @@ class Net(DynamicNetBase):
 
     def grow_node(self, type='hidden'):
 
+        self.clear_inference_caches()
+
         if type == 'input':
 
             new_input_node = Node('input', self.nb_nodes_grown)
@@ -109,6 +113,8 @@ class Net(DynamicNetBase):
 
     def grow_connection(self, in_node=None, out_node=None):
 
+        self.clear_inference_caches()
+
         if in_node == None:
 
             potential_in_nodes = deterministic_set(self.nodes['receiving'])
@@ -149,6 +155,8 @@ class Net(DynamicNetBase):
             
     def prune_node(self, node=None):
 
+        self.clear_inference_caches()
+
         if node == None:
 
             if len(self.nodes['hidden']) == 0:
@@ -156,32 +164,11 @@ class Net(DynamicNetBase):
 
             node = np.random.choice(self.nodes['hidden'])
 
-        if node in self.nodes['being pruned']:
-            return
-
-        self.nodes['being pruned'].append(node)
-
-        for out_node in node.out_nodes.copy():
-            self.prune_connection(node, out_node, node)
-
-        for in_node in node.in_nodes.copy():
-            self.prune_connection(in_node, node, node)
-
-        for key in self.nodes:
-
-            if key == 'layered':
+        self.prune([node], [])
 
-                node_layer = find_sublist_index(node, self.nodes['layered'])
-                self.nodes['layered'][node_layer].remove(node)
+    def prune_connection(self, in_node=None, out_node=None):
 
-                if node_layer != 0 and node_layer != len(self.nodes['layered']) - 1: 
-                    if self.nodes['layered'][node_layer] == []:
-                        self.nodes['layered'].remove(self.nodes['layered'][node_layer])
-            else:
-                while node in self.nodes[key]:
-                    self.nodes[key].remove(node)   
-          
-    def prune_connection(self, in_node=None, out_node=None, calling_node=None):
+        self.clear_inference_caches()
 
         if in_node == None:
 
@@ -194,57 +181,249 @@ class Net(DynamicNetBase):
 
             out_node = np.random.choice(in_node.out_nodes)
 
-        connection_was_already_pruned = in_node.disconnect_from(out_node)
+        self.prune([], [(in_node, out_node)])
 
-        if connection_was_already_pruned:
-            return
-        
-        self.nodes['receiving'].remove(out_node)
-        self.nodes['emitting'].remove(in_node)
+    def prune(self, nodes, connections):
+        """
+        Prune nodes & connections along with, in cascade, the hidden nodes they leave orphaned (no longer receiving or
+        emitting, or only from/to themselves) and the output nodes' isolated self-connections.
+        The cascade is processed through a worklist (its outcome does not depend on the processing order) and the
+        pruned nodes & connections are then removed from the node lists all at once.
+        """
+        pruned_nodes = set(nodes)
+
+        nb_pruned_connections = {'receiving': collections.Counter(), 'emitting': collections.Counter()}
+
+        while len(nodes) + len(connections) > 0:
+
+            if len(connections) == 0:
+
+                node = nodes.pop()
+
+                connections += [(node, out_node) for out_node in node.out_nodes]
+                connections += [(in_node, node) for in_node in node.in_nodes]
 
-        if in_node != calling_node:
+                continue
 
-            if in_node not in self.nodes['emitting']:
-                if in_node in self.nodes['hidden']:
-                    self.prune_node(in_node)
+            in_node, out_node = connections.pop()
 
-        if out_node != calling_node:
+            connection_was_already_pruned = in_node.disconnect_from(out_node)
 
-            if out_node not in self.nodes['receiving']:
-                if out_node in self.nodes['hidden']:
-                    self.prune_node(out_node)
+            if connection_was_already_pruned:
+                continue
 
-        for node in [in_node, out_node]:
+            nb_pruned_connections['receiving'][out_node] += 1
+            nb_pruned_connections['emitting'][in_node] += 1
 
-            if node != calling_node and node not in self.nodes['being pruned']:
+            for node in [in_node, out_node]:
 
-                if node in self.nodes['hidden']:
-                    if node.in_nodes == [node] or node.out_nodes == [node]:
-                        self.prune_node(node)
+                if node in pruned_nodes:
+                    continue
+
+                if node.type == 'hidden':
+
+                    if node.in_nodes == [] or node.out_nodes == [] or \
+                       node.in_nodes == [node] or node.out_nodes == [node]:
+
+                        pruned_nodes.add(node)
+                        nodes.append(node)
+
+                elif node.type == 'output':
 
-                elif node in self.nodes['output']:
                     if node.in_nodes == [node] and node.out_nodes == [node]:
-                        self.prune_connection(node, node)
+                        connections.append((node, node))
+
+        # Only the first occurrences of a node are removed, as would successive calls to list.remove
+        for key in ['receiving', 'emitting']:
+
+            remaining_nodes = []
+
+            for node in self.nodes[key]:
+
+                if nb_pruned_connections[key][node] > 0:
+                    nb_pruned_connections[key][node] -= 1
+                else:
+                    remaining_nodes.append(node)
+
+            self.nodes[key] = remaining_nodes
+
+        if len(pruned_nodes) == 0:
+            return
+
+        for key in ['all', 'hidden']:
+            self.nodes[key] = [node for node in self.nodes[key] if node not in pruned_nodes]
+
+        layered = [[node for node in layer if node not in pruned_nodes] for layer in self.nodes['layered']]
+
+        # The input & output layers are kept even if empty
+        self.nodes['layered'] = [layer for i, layer in enumerate(layered)
+                                 if len(layer) > 0 or i == 0 or i == len(layered) - 1]
+
+    def get_stats(self):
+
+        layers = {}
+
+        for layer, nodes in enumerate(self.nodes['layered']):
+            for node in nodes:
+                layers[node] = layer
+
+        nb_recurrent_connections = 0
+
+        for node in self.nodes['all']:
+            for out_node in node.out_nodes:
+                if layers[out_node] <= layers[node]: # Feeds back (or within) its own layer
+                    nb_recurrent_connections += 1
+
+        return {'nb_input_nodes': len(self.nodes['input']),
+                'nb_hidden_nodes': len(self.nodes['hidden']),
+                'nb_output_nodes': len(self.nodes['output']),
+                'nb_connections': len(self.nodes['emitting']),
+                'nb_recurrent_connections': nb_recurrent_connections,
+                'nb_layers': len(self.nodes['layered'])}
+
+    def get_live_layered(self):
+        """
+        Layered nodes stripped of those from which no output node can be reached (found through a reverse traversal
+        from the output nodes). These dead nodes have no influence on the outputs and are skipped during inference.
+        Cached until the next architectural mutation, the architecture itself is left untouched.
+        """
+        if not hasattr(self, 'live_layered'):
+
+            live_nodes = set(self.nodes['output'])
+            nodes_to_visit = list(self.nodes['output'])
+
+            while len(nodes_to_visit) > 0:
+                for in_node in nodes_to_visit.pop().in_nodes:
+                    if in_node not in live_nodes:
+                        live_nodes.add(in_node)
+                        nodes_to_visit.append(in_node)
+
+            self.live_layered = [[node for node in layer if node in live_nodes] for layer in self.nodes['layered']]
+
+        return self.live_layered
+
+    def get_topology(self):
+        """
+        Canonical description of the net's (live) topology, nets sharing it only differ by their parameters.
+        """
+        return (tuple([node.id for node in self.nodes['input']]),
+                tuple([node.id for node in self.nodes['output']]),
+                tuple([tuple([(node.id, tuple([in_node.id for in_node in node.in_nodes])) for node in layer])
+                       for layer in self.get_live_layered()[1:]]))
+
+    def clear_inference_caches(self):
+
+        if hasattr(self, 'live_layered'):
+            del self.live_layered
+
+        if hasattr(self, 'plan'):
+            del self.plan, self.plan_parameters, self.plan_outputs
+
+    def setup_to_run(self):
+
+        self.get_live_layered()
+
+        if plan_cache.size > 0:
+
+            self.plan = plan_cache.get(self)
+            self.plan_parameters = self.plan.get_parameters(self)
+            self.plan_outputs = np.zeros(self.plan.nb_nodes)
+
+    def setup_to_save(self):
+
+        self.clear_inference_caches()
+
+        for node in self.nodes['all']: # Left over by the last timestep, recomputed before being used
+            if hasattr(node, 'future_output'):
+                del node.future_output
+
     def reset(self):
 
         for node in self.nodes['all']:
             node.output = np.array([0])
 
+        if hasattr(self, 'plan'):
+            self.plan_outputs[:] = 0
+
     def __call__(self, x):
 
+        if hasattr(self, 'plan'):
+            return self.plan(self.plan_outputs, self.plan_parameters, x)
+
         for x_i, node in zip(x, self.nodes['input']):
             node.output = x_i
-            
-        for layer in range( 1, len(self.nodes['layered']) ):
 
-            for node in self.nodes['layered'][layer]:
+        live_layered = self.get_live_layered()
+
+        for layer in range( 1, len(live_layered) ):
+
+            for node in live_layered[layer]:
                 node.compute()
 
-            for node in self.nodes['layered'][layer]:
+            for node in live_layered[layer]:
                 node.update()
 
         return [ node.output for node in self.nodes['output'] ]
 
+    def __getstate__(self):
+        """
+        Flat state : nodes refer to each other through their positions in a single list of node states, so that
+        pickling & copying nets does not recurse through their (possibly very long) chains of connected nodes.
+        """
+        state = self.__dict__.copy()
+
+        if 'live_layered' in state: # Recomputed when needed
+            del state['live_layered']
+
+        positions = {}
+
+        for key in self.nodes:
+
+            nodes = [node for layer in self.nodes[key] for node in layer] if key == 'layered' else self.nodes[key]
+
+            for node in nodes:
+                if node not in positions:
+                    positions[node] = len(positions)
+
+        state['node_states'] = []
+
+        for node in positions:
+
+            node_state = node.__dict__.copy()
+
+            node_state['in_nodes'] = [positions[in_node] for in_node in node.in_nodes]
+            node_state['out_nodes'] = [positions[out_node] for out_node in node.out_nodes]
+
+            state['node_states'].append(node_state)
+
+        state['nodes'] = {key: [[positions[node] for node in layer] for layer in self.nodes[key]] if key == 'layered'
+                          else [positions[node] for node in self.nodes[key]] for key in self.nodes}
+
+        return state
+
+    def __setstate__(self, state):
+
+        if 'node_states' in state: # Nets pickled before flat states were introduced are loaded as is
+
+            nodes = []
+
+            for node_state in state.pop('node_states'):
+
+                node = Node.__new__(Node)
+                node.__dict__.update(node_state)
+
+                nodes.append(node)
+
+            for node in nodes:
+
+                node.in_nodes = [nodes[i] for i in node.in_nodes]
+                node.out_nodes = [nodes[i] for i in node.out_nodes]
+
+            state['nodes'] = {key: [[nodes[i] for i in layer] for layer in state['nodes'][key]] if key == 'layered'
+                              else [nodes[i] for i in state['nodes'][key]] for key in state['nodes']}
+
+        self.__dict__.update(state)
+
 
 class Node:
 
@@ -322,3 +501,145 @@ class Node:
     def update(self):
 
         self.output = self.future_output
+
+
+class Plan:
+    """
+    Compiled forward pass of a topology : all nodes' outputs are stored in one array and, for each layer, the nodes
+    are computed at once (inputs gathered through index arrays and summed up per node).
+    Shared by all nets of the same topology, which only swap their parameters in.
+    """
+    def __init__(self, net):
+
+        live_layered = net.get_live_layered()
+
+        nodes = net.nodes['input'] + [node for layer in live_layered[1:] for node in layer]
+        positions = {node: i for i, node in enumerate(nodes)}
+
+        self.nb_nodes = len(nodes)
+
+        self.input_positions = np.array([positions[node] for node in net.nodes['input']], dtype=int)
+        self.output_positions = np.array([positions[node] for node in net.nodes['output']], dtype=int)
+
+        self.layers = []
+
+        for layer in live_layered[1:]:
+
+            node_positions = [positions[node] for node in layer]
+            in_positions = [positions[in_node] for node in layer for in_node in node.in_nodes]
+            segments = [k for k, node in enumerate(layer) for _ in node.in_nodes]
+
+            self.layers.append( (np.array(node_positions, dtype=int), np.array(in_positions, dtype=int),
+                                 np.array(segments, dtype=int)) )
+
+    def get_parameters(self, net):
+        """
+        Weights & biases of net `net` (of this plan's topology), concatenated per layer.
+        """
+        return [(np.concatenate([np.empty(0)] + [node.weights for node in layer]),
+                 np.concatenate([np.empty(0)] + [node.bias for node in layer])) for layer in net.get_live_layered()[1:]]
+
+    def __call__(self, outputs, parameters, x):
+        """
+        Run a net for one timestep given its nodes' outputs (updated in place), its parameters and input 'x'.
+        Returns the net's outputs.
+        """
+        outputs[self.input_positions] = np.reshape(x, -1)
+
+        for (node_positions, in_positions, segments), (weights, biases) in zip(self.layers, parameters):
+
+            x = np.bincount(segments, outputs[in_positions] * weights, len(node_positions)) + biases
+
+            outputs[node_positions] = np.clip(x, 0, 2**31-1)
+
+        return outputs[self.output_positions][:, None]
+
+
+class PlanCache:
+    """
+    Keeps the `size` most recently used Plans, indexed by topology (0 : Plans are not used).
+    After selection, most nets of a process share the topology of a common parent and thus reuse the same Plan.
+    Plans run vectorized, hence slightly differ in floating point from the default node by node inference.
+    """
+    def __init__(self, size=0):
+
+        self.size = size
+
+        self.plans = collections.OrderedDict()
+
+        # Nets can be set up from multiple threads
+        self.lock = threading.Lock()
+
+    def get(self, net):
+
+        topology = net.get_topology()
+
+        with self.lock:
+
+            if topology in self.plans:
+
+                self.plans.move_to_end(topology)
+
+            else:
+
+                self.plans[topology] = Plan(net)
+
+                if len(self.plans) > self.size:
+                    self.plans.popitem(last=False)
+
+            return self.plans[topology]
+
+plan_cache = PlanCache()
+
+
+class NetBatch:
+    """
+    Compiles several Nets into a single segmented representation in order to run them in lockstep.
+    The outputs of all nodes are stored in one array and, for each layer depth, the nodes of all nets are computed
+    at once (inputs gathered through index arrays and summed up per node).
+    """
+    def __init__(self, nets):
+
+        nodes = [node for net in nets for node in net.nodes['all']]
+        positions = {node: i for i, node in enumerate(nodes)}
+
+        self.outputs = np.zeros(len(nodes))
+
+        self.input_positions = np.array([positions[node] for net in nets for node in net.nodes['input']], dtype=int)
+        self.output_positions = np.array([[positions[node] for node in net.nodes['output']] for net in nets], dtype=int)
+
+        self.layers = []
+
+        nets_layered = [net.get_live_layered() for net in nets] # Nodes that can't reach outputs are skipped
+
+        for layer in range( 1, max([len(layered) for layered in nets_layered]) ):
+
+            layer_nodes = [node for layered in nets_layered if layer < len(layered) for node in layered[layer]]
+
+            node_positions = [positions[node] for node in layer_nodes]
+            in_positions = [positions[in_node] for node in layer_nodes for in_node in node.in_nodes]
+            segments = [k for k, node in enumerate(layer_nodes) for _ in node.in_nodes]
+            weights = np.concatenate([np.empty(0)] + [node.weights for node in layer_nodes])
+            biases = np.concatenate([np.empty(0)] + [node.bias for node in layer_nodes])
+
+            self.layers.append( (np.array(node_positions, dtype=int), np.array(in_positions, dtype=int),
+                                 np.array(segments, dtype=int), weights, biases) )
+
+    def reset(self):
+
+        self.outputs[:] = 0
+
+    def __call__(self, x):
+        """
+        Run the nets for one timestep given input 'x' (one row per net).
+        Returns the nets' outputs (one row per net).
+        """
+        self.outputs[self.input_positions] = np.reshape(x, -1)
+
+        for node_positions, in_positions, segments, weights, biases in self.layers:
+
+            x = np.bincount(segments, self.outputs[in_positions] * weights, len(node_positions)) + biases
+
+            self.outputs[node_positions] = np.clip(x, 0, 2**31-1)
+
+        return self.outputs[self.output_positions]
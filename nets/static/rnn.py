@@ -59,4 +59,65 @@ class Net(StaticNetBase):
                 
                 x = torch.relu( self.fc[i](x) )
         
-        return x
\ No newline at end of file
+        return x
+
+class NetBatch:
+    """
+    Stacks the parameters of several Nets (of identical dimensions) in order to run them in lockstep.
+    """
+    def __init__(self, nets):
+
+        self.dimensions = nets[0].dimensions
+        self.recurrent = nets[0].recurrent
+        self.device = nets[0].device
+        self.nb_nets = len(nets)
+
+        self.fc_weights = [torch.stack([net.fc[i].weight for net in nets]) for i in range(len(nets[0].fc))]
+        self.fc_biases = [torch.stack([net.fc[i].bias for net in nets]) for i in range(len(nets[0].fc))]
+
+        if self.recurrent:
+
+            self.rnn_weights_ih = torch.stack([net.rnn.weight_ih_l0 for net in nets])
+            self.rnn_weights_hh = torch.stack([net.rnn.weight_hh_l0 for net in nets])
+            self.rnn_biases_ih = torch.stack([net.rnn.bias_ih_l0 for net in nets])
+            self.rnn_biases_hh = torch.stack([net.rnn.bias_hh_l0 for net in nets])
+
+        self.reset()
+
+    def reset(self):
+
+        if self.recurrent:
+            d_h = self.dimensions[-1 if len(self.dimensions) == 2 else -2]
+            self.h = torch.zeros(self.nb_nets, d_h).to(self.device)
+
+    def linear(self, x, weights, biases):
+
+        return torch.baddbmm(biases[:, :, None], weights, x[:, :, None])[:, :, 0]
+
+    def __call__(self, x, mask):
+        """
+        Run the nets for one timestep given input 'x' (one row per net).
+        The hidden states of masked out nets are left untouched.
+        """
+        for i, _ in enumerate(self.dimensions[:-1]):
+
+            if self.recurrent == True:
+
+                if i+3 == len(self.dimensions) or len(self.dimensions) == 2:
+
+                    x = torch.tanh( self.linear(x, self.rnn_weights_ih, self.rnn_biases_ih) + \
+                                    self.linear(self.h, self.rnn_weights_hh, self.rnn_biases_hh) )
+
+                    self.h = torch.where(mask[:, None], x, self.h)
+
+                elif i+2 == len(self.dimensions):
+                    x = torch.relu( self.linear(x, self.fc_weights[-1], self.fc_biases[-1]) )
+
+                else:
+                    x = torch.relu( self.linear(x, self.fc_weights[i], self.fc_biases[i]) )
+
+            else:
+
+                x = torch.relu( self.linear(x, self.fc_weights[i], self.fc_biases[i]) )
+
+        return x
@@ -0,0 +1,145 @@
+"""
+Microbenchmarks of the dynamic nets (nets/dynamic/recurrent.py).
+
+A net is grown through seeded mutations to increasing numbers of nodes. At each size, its architectural mutations,
+forward pass, reset & (de)serialization are timed separately (median over repeats, each mutation being applied to a
+fresh copy of the net). Results are reported as JSON along with each operation's scaling exponent (slope of the
+log-log curve of its time against the number of nodes).
+"""
+import argparse
+import json
+import numpy as np
+import os
+import pickle
+import sys
+import time
+import warnings
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/../..')
+
+from nets.dynamic.recurrent import Net
+from utils.functions.gym import get_info
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--sizes', '-s', type=int, nargs='+', default=[100, 300, 1000, 3000, 10000],
+                    help="Numbers of nodes to grow the net to.")
+
+parser.add_argument('--connections_per_node', '-c', type=int, default=2,
+                    help="Number of additional connections grown along with each node.")
+
+parser.add_argument('--nb_repeats', '-r', type=int, default=10,
+                    help="Number of times each operation is timed per size.")
+
+parser.add_argument('--task', '-t', type=str, default='acrobot',
+                    help="Task whose observation & action dimensions the net's inputs & outputs match.")
+
+parser.add_argument('--seed', '-e', type=int, default=0,
+                    help="Seed of the mutations.")
+
+parser.add_argument('--output_path', '-o', type=str, default=None,
+                    help="Path to a JSON file to save the results to (printed otherwise).")
+
+args = parser.parse_args()
+
+warnings.filterwarnings('ignore')
+
+def time_operation(net, operation, setup=None):
+    """
+    Median time of `operation` (function of a net) applied to fresh copies of `net`, each copy being first passed to
+    `setup` (if given, outside of the timed region).
+    """
+    pickled_net = pickle.dumps(net)
+
+    times = []
+
+    for repeat in range(args.nb_repeats):
+
+        net_copy = pickle.loads(pickled_net)
+
+        if setup != None:
+            setup(net_copy)
+
+        np.random.seed(args.seed + repeat)
+
+        start = time.perf_counter()
+        operation(net_copy)
+        times.append(time.perf_counter() - start)
+
+    return float(np.median(times))
+
+def run():
+
+    d_input, d_output, _, _ = get_info(args.task)
+
+    np.random.seed(args.seed)
+
+    net = Net(d_input, d_output)
+    net.initialize_architecture()
+
+    x = np.random.randn(d_input)
+
+    operations = {'grow_node': lambda net: net.grow_node(),
+                  'grow_connection': lambda net: net.grow_connection(),
+                  'prune_node': lambda net: net.prune_node(),
+                  'prune_connection': lambda net: net.prune_connection(),
+                  '__call__': lambda net: net(x),
+                  'reset': lambda net: net.reset(),
+                  'pickle.dumps': lambda net: pickle.dumps(net),
+                  'pickle.loads': None}
+
+    # Nets are set up to run (live layers & inference plan computed) before their forward passes, as when evaluated
+    setups = {'__call__': lambda net: net.setup_to_run()}
+
+    results = {'sizes': [], 'nb_connections': [], 'nb_layers': [], 'times': {key: [] for key in operations}}
+
+    for size in sorted(args.sizes):
+
+        np.random.seed(args.seed + size)
+
+        while len(net.nodes['all']) < size:
+
+            net.grow_node()
+
+            for _ in range(args.connections_per_node):
+                net.grow_connection()
+
+        for key in operations:
+
+            if key == 'pickle.loads':
+
+                pickled_net = pickle.dumps(net)
+
+                results['times'][key].append( time_operation(net, lambda net: pickle.loads(pickled_net)) )
+
+            else:
+
+                results['times'][key].append( time_operation(net, operations[key], setups.get(key)) )
+
+        results['sizes'].append( len(net.nodes['all']) )
+        results['nb_connections'].append( len(net.nodes['emitting']) )
+        results['nb_layers'].append( len(net.nodes['layered']) )
+
+        print(results['sizes'][-1], 'nodes :',
+              ', '.join([key + ' ' + format(results['times'][key][-1], '.2e') + 's' for key in operations]),
+              file=sys.stderr)
+
+    # Scaling exponents : time ~ size ** slope
+    if len(results['sizes']) > 1:
+
+        results['slopes'] = {}
+
+        for key in operations:
+            results['slopes'][key] = float(np.polyfit(np.log(results['sizes']),
+                                                      np.log(results['times'][key]), 1)[0])
+
+    if args.output_path == None:
+
+        print( json.dumps(results) )
+
+    else:
+
+        with open(args.output_path, 'w') as f:
+            json.dump(results, f, indent=4)
+
+run()
@@ -0,0 +1,99 @@
+"""
+End-to-end benchmark of the evolution loop.
+
+Runs `main.py` on the synthetic environment (envs/synthetic/score.py, deterministic and gym-free) over a matrix of
+communication protocols, numbers of processes, population sizes & bots and reports, for each run, its generations/s,
+env steps/s, bytes sent, startup time and peak RSS per process as JSON (one line per run) so that versions can be
+compared.
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--communications', '-c', type=str, nargs='+', default=['ps', 'ps_p2p', 'big_ps_p2p'],
+                    help="Communication protocols to benchmark.")
+
+parser.add_argument('--nb_processes', '-n', type=int, nargs='+', default=[1, 2, 4],
+                    help="Numbers of processes to benchmark.")
+
+parser.add_argument('--population_sizes', '-p', type=int, nargs='+', default=[16, 64],
+                    help="Population sizes to benchmark.")
+
+parser.add_argument('--bots_paths', '-b', type=str, nargs='+',
+                    default=['bots/static/rnn/control.py', 'bots/dynamic/rnn/control.py'],
+                    help="Bots to benchmark.")
+
+parser.add_argument('--nb_generations', '-g', type=int, default=10,
+                    help="Number of generations per run.")
+
+parser.add_argument('--additional_arguments', '-a', type=str,
+                    default='{"task" : "acrobot", "episode_length" : 200}',
+                    help="Additional arguments of the synthetic environment (JSON string).")
+
+parser.add_argument('--backend', '-m', choices=['local', 'mpi'], default='local',
+                    help="local : Processes are forked by `main.py`. mpi : Processes are launched through `mpiexec`.")
+
+parser.add_argument('--output_path', '-o', type=str, default=None,
+                    help="Path to a file to append the results to (printed otherwise).")
+
+args = parser.parse_args()
+
+main_path = os.path.dirname(os.path.realpath(__file__)) + '/../../main.py'
+
+for communication, nb_processes, population_size, bots_path in itertools.product(args.communications,
+                                                                                 args.nb_processes,
+                                                                                 args.population_sizes,
+                                                                                 args.bots_paths):
+
+    if population_size % nb_processes != 0:
+        continue
+
+    run = {'communication': communication,
+           'nb_processes': nb_processes,
+           'population_size': population_size,
+           'bots_path': bots_path,
+           'nb_generations': args.nb_generations,
+           'additional_arguments': json.loads(args.additional_arguments)}
+
+    # States are saved in a temporary working directory
+    with tempfile.TemporaryDirectory() as cwd:
+
+        command = [sys.executable, os.path.realpath(main_path),
+                   '--env_path', 'envs/synthetic/score.py',
+                   '--bots_path', bots_path,
+                   '--population_size', str(population_size),
+                   '--nb_generations', str(args.nb_generations),
+                   '--communication', communication,
+                   '--additional_arguments', args.additional_arguments,
+                   '--stats_path', cwd + '/stats.json']
+
+        if args.backend == 'local':
+            command += ['--backend', 'local', '--nb_processes', str(nb_processes)]
+        else: # args.backend == 'mpi':
+            command = ['mpiexec', '-n', str(nb_processes)] + command
+
+        process = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+        if process.returncode != 0:
+
+            run['error'] = process.stderr.decode()[-1000:]
+
+        else:
+
+            with open(cwd + '/stats.json') as f:
+                run.update( json.load(f) )
+
+    if args.output_path == None:
+
+        print( json.dumps(run) )
+
+    else:
+
+        with open(args.output_path, 'a') as f:
+            f.write( json.dumps(run) + '\n' )
@@ -1,18 +1,23 @@
 import argparse
+import collections
+import copy
 import glob
 import numpy as np
 import os
 import pickle
-import random
+import shutil
 import sys
-import torch
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from mpi4py import MPI
 
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/..')
 
+from utils.functions.misc import parse_additional_arguments, set_seeds
+from utils.functions.profiling import Profiler, clear_profiles, summarize
+from utils.functions.states import IndexedBots, is_indexed_state, select, unpickle_indexed_bots
+
 warnings.filterwarnings("ignore", category=UserWarning)
-sys.setrecursionlimit(2**31-1)
 
 parser = argparse.ArgumentParser()
 
@@ -26,6 +31,20 @@ parser.add_argument('--nb_tests', '-t', type=int, default=10,
 parser.add_argument('--nb_obs_per_test', '-o', type=int, default=2**31-1,
                     help="Number of observations to evaluate the agents on per test.")
 
+parser.add_argument('--cache_size', '-c', type=int, default=None,
+                    help="'ps' states only : Number of built bots to keep in memory for the bots of later generations to \
+                          be built from (no mutation replayed twice). Defaults to the population size.")
+
+parser.add_argument('--prefetch', '-p', type=int, default=1,
+                    help="Number of upcoming generations whose states are read in the background (while the current \
+                          one is being evaluated, their bots only being unpickled once needed), also the maximum \
+                          number of such states held in memory at once. (0 : disabled)")
+
+parser.add_argument('--profile', '-z', type=int, nargs='*', default=None,
+                    help="Profiles (cProfile) the processes of the given ranks (all processes if no rank is given). \
+                          Profiles are dumped into <states_path>/profiles/evaluate/ and merged into a summary of the \
+                          hottest functions (summary.txt).")
+
 args = parser.parse_args()
 
 comm = MPI.COMM_WORLD
@@ -48,17 +67,18 @@ additional_arguments = split_path[-3]
 bots_path = split_path[-2]
 pop_size = int(split_path[-1])
 
-split_additional_arguments = additional_arguments.split('~')
+additional_arguments = parse_additional_arguments(additional_arguments)
 
-task = split_additional_arguments[0].split('.')[1]
-trials = split_additional_arguments[1].split('.')[1]
+task = additional_arguments['task']
+trials = additional_arguments['trials']
+action_repeat = additional_arguments.get('action_repeat', 1)
 
 """
 Initialize environment
 """
 
 import gym
-from utils.functions.gym import control_task_name
+from utils.functions.gym import control_task_name, load_standardization, step
 
 emulator = gym.make( control_task_name(task) )
 
@@ -71,34 +91,96 @@ if 'static.rnn' in bots_path:
 else: # 'dynamic.rnn' in bots_path:
     from bots.dynamic.rnn.control import Bot
 
-"""
-Distribute workload
-"""
+# Arguments of the bots built from their seeds ('ps' states)
+bot_args = argparse.Namespace(additional_arguments=additional_arguments, enable_gpu_use=0)
 
-files = [os.path.basename(x) for x in glob.glob(args.states_path + '/*')]
+if args.cache_size == None:
+    args.cache_size = pop_size
 
-gens = []
+if args.cache_size < 0:
+    raise RuntimeError("'cache_size' needs to be >= 0.")
 
-for file in files:
-    if file.isdigit() and os.path.isdir(args.states_path + '/' + file):
-        gens.append( int(file) )
+if args.prefetch < 0:
+    raise RuntimeError("'prefetch' needs to be >= 0.")
+
+class BotCache:
+    """
+    Keeps the `args.cache_size` most recently built bots ('ps' states), indexed by their seed list.
+    As a bot's seed list starts with that of its ancestors', bots of later generations are built by extending the
+    closest cached ancestor with the remaining seeds rather than from scratch.
+    """
+    def __init__(self):
+
+        self.bots = collections.OrderedDict()
+
+        # Number of cached bots per seed list length
+        self.lengths = collections.Counter()
+
+    def build(self, seeds):
+
+        seeds = tuple(int(seed) for seed in seeds)
+
+        bot = None
+
+        for length in sorted(self.lengths, reverse=True):
+
+            if length <= len(seeds) and seeds[:length] in self.bots:
+
+                self.bots.move_to_end(seeds[:length])
+                bot = copy.deepcopy(self.bots[seeds[:length]])
+                break
+
+        if bot == None:
+
+            length = 0
+            bot = Bot(bot_args, rank, 0, 1)
+            bot.initialize()
+
+        for seed in seeds[length:]:
+            bot.extend(seed)
+
+        if args.cache_size > 0 and seeds not in self.bots:
 
-gens.sort()
+            # Bots are cached before being run, as running them updates their observation statistics
+            self.bots[seeds] = copy.deepcopy(bot)
+            self.lengths[len(seeds)] += 1
 
-process_gens = []
+            if len(self.bots) > args.cache_size:
 
-for i in range( len(gens) ):
-    if i % size == rank:
-        process_gens.append(gens[i])
+                evicted_seeds, _ = self.bots.popitem(last=False)
+                self.lengths[len(evicted_seeds)] -= 1
 
-for gen in process_gens:
+                if self.lengths[len(evicted_seeds)] == 0:
+                    del self.lengths[len(evicted_seeds)]
 
-    print('Gen : ' + str(gen))
+        return bot
 
+bot_cache = BotCache()
+
+"""
+Load & run agents
+"""
+
+def read_state(gen, read_bots=True):
+    """
+    Read generation `gen`'s saved state without unpickling it (file reads, unlike unpickling, release the GIL and can
+    hence overlap with evaluations when carried out in the background, see *StateLoader*).
+    Returns its state files' contents, or its lazily loaded bots along with the positions of the selected ones and
+    their pickled forms (indexed 'ps_p2p' and 'big_ps_p2p' states, None if not `read_bots`, the selected bots then
+    being read as they are accessed).
+    """
     path = args.states_path + '/' + str(gen) + '/'
 
-    if os.path.isfile(path + 'scores.npy'):
-        continue
+    if is_indexed_state(path):
+
+        bots = IndexedBots(path)
+
+        selected_indices = select(bots.fitnesses)
+
+        if not read_bots:
+            return bots, selected_indices, None
+
+        return bots, selected_indices, bots.read(selected_indices)
 
     pkl_files = [os.path.basename(x) for x in glob.glob(path + '*.pkl')]
 
@@ -113,76 +195,481 @@ for gen in process_gens:
     if len(state_files) == 0:
         raise RuntimeError("Directory '" + path + "' empty.")
 
-    try:
+    pickled_states = []
+
+    for i in range( len(state_files) ):
+
+        try:
 
-        with open(path + '0.pkl', 'rb') as f:
-            state = pickle.load(f)
+            with open(path + str(i) + '.pkl', 'rb') as f:
+                pickled_states.append( f.read() )
 
-    except IOError:
+        except IOError:
 
-        print("File '" + path + "0.pkl' doesn't exist / is corrupted.")
+            print("File '" + path + str(i) + ".pkl' doesn't exist / is corrupted.")
+
+    return pickled_states
+
+def load_state(pickled_state):
+    """
+    Load a state read by *read_state*.
+    Returns the seed lists of its bots ('ps' states), its selected bots ('ps_p2p' and 'big_ps_p2p' states) or its
+    lazily loaded bots along with the positions of the selected ones and their pickled forms (indexed 'ps_p2p' and
+    'big_ps_p2p' states, bots being unpickled as they are accessed).
+    """
+    if isinstance(pickled_state, tuple): # indexed 'ps_p2p' or 'big_ps_p2p' state
+        return pickled_state
+
+    state = pickle.loads(pickled_state[0])
 
     if len(state) == 3:
 
         full_seed_list, _, _ = state
 
+        return full_seed_list
+
     else: # len(state) == 4:
 
         _, _, latest_fitnesses_and_bot_sizes, bots = state
 
-        for i in range( 1, len(state_files) ):
+        for i in range( 1, len(pickled_state) ):
+            bots += pickle.loads(pickled_state[i])[0]
+
+        selected_indices = select(latest_fitnesses_and_bot_sizes[:, :, 0])
+
+        return [bots[selected_indices[i]] for i in range(pop_size//2)]
+
+def get_bot(state, i):
+    """
+    Get the state's i-th bot.
+    """
+    if isinstance(state, np.ndarray): # 'ps' state
+
+        bot = bot_cache.build(state[i][0])
+
+    elif isinstance(state, tuple): # indexed 'ps_p2p' or 'big_ps_p2p' state
 
-            try:
+        bots, selected_indices, pickled_bots = state
 
-                with open(path + str(i) + '.pkl', 'rb') as f:
-                    bots += pickle.load(f)[0]
+        if pickled_bots is None:
+            bot = bots[selected_indices[i]][0]
+        else:
+            bot = unpickle_indexed_bots(*pickled_bots[i])[0]
+
+    else: # 'ps_p2p' or 'big_ps_p2p' state
+
+        bot = state[i][0]
+
+    return bot
+
+def run_test(bot, j, standardization=None):
+    """
+    Run the bot on the j-th test, returns its score.
+    """
+    score = 0
 
-            except IOError:
+    set_seeds(MAX_INT-j)
+    bot.reset()
+    
+    emulator.seed(MAX_INT-j)
+    obs = emulator.reset()
+    done = False
 
-                print("File '" + path + str(i) + ".pkl' doesn't exist / is corrupted.")
+    for k in range(args.nb_obs_per_test):
 
-        fitnesses_sorting_indices = latest_fitnesses_and_bot_sizes[:, :, 0].argsort(axis=0)
-        fitnesses_rankings = fitnesses_sorting_indices.argsort(axis=0)
-        selected = np.greater_equal(fitnesses_rankings, pop_size//2)
-        selected_indices = np.where(selected[:,0] == True)[0]
+        if standardization is not None:
+            obs = (obs - standardization[0]) * standardization[1]
+
+        obs, rew, done, _, _ = step(emulator, bot(obs), action_repeat)
+
+        score += rew
+
+        if done:
+            break
+
+    return score
+
+def save_atomically(obj, path):
+    """
+    Save `obj` (NumPy array or picklable object) so that `path` is never left half-written.
+    """
+    if isinstance(obj, np.ndarray):
+        np.save(path[:-4] + '.tmp.npy', obj)
+        os.replace(path[:-4] + '.tmp.npy', path)
+    else:
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(path + '.tmp', path)
 
-    scores = np.zeros((pop_size//2, args.nb_tests))
+"""
+Incremental scores
+
+Until a generation has been fully evaluated, its scores are stored in a memory-mapped array (scores.partial.npy)
+alongside a completion bitmap (scores.done.npy), both updated after every test (after every bot when evaluating with
+several processes, the scores then being sent to process 0, the only one writing these files).
+As bots' running states (e.g. running observation statistics, see *BotBase.get_running_state*) carry over from one
+test to the next, they are also saved along the scores (evaluation/<bot>.pkl, with the number of tests run), then
+gathered into evaluation_running_states.pkl once the generation has been fully evaluated (the other files being
+removed). Interrupted evaluations can therefore resume exactly where they stopped and additional tests (`--nb_tests`
+increase) can be run without recomputing the previous ones.
+"""
 
+def prepare_scores(gen):
     """
-    Run agents
+    Create (or extend to `args.nb_tests` tests) generation `gen`'s incremental score files.
     """
+    path = args.states_path + '/' + str(gen) + '/'
 
-    for i in range(pop_size//2):
+    if os.path.isfile(path + 'scores.partial.npy'):
 
-        if len(state) == 3:
+        scores = np.load(path + 'scores.partial.npy')
+        done = np.load(path + 'scores.done.npy')
 
-            bot = Bot(0)
-            bot.build(full_seed_list[i][0])
+        if scores.shape[1] >= args.nb_tests:
+            return
 
-        else: # len(state) == 4:
+    elif os.path.isfile(path + 'scores.npy'):
 
-            bot = bots[selected_indices[i]][0]
-        
-        bot.setup_to_run()
+        scores = np.load(path + 'scores.npy')
+        done = np.ones(scores.shape, dtype=bool)
+
+    else:
+
+        scores = np.zeros((pop_size//2, 0))
+        done = np.zeros((pop_size//2, 0), dtype=bool)
+
+    new_scores = np.zeros((pop_size//2, args.nb_tests))
+    new_done = np.zeros((pop_size//2, args.nb_tests), dtype=bool)
+
+    new_scores[:, :scores.shape[1]] = scores
+    new_done[:, :done.shape[1]] = done
+
+    # The score file's existence marks the files as ready
+    save_atomically(new_done, path + 'scores.done.npy')
+    save_atomically(new_scores, path + 'scores.partial.npy')
+
+def complete_scores(gen):
+    """
+    Turn generation `gen`'s incremental score files into its final score file.
+    """
+    path = args.states_path + '/' + str(gen) + '/'
+
+    scores = np.load(path + 'scores.partial.npy')
+
+    save_atomically(scores[:, :args.nb_tests], path + 'scores.npy')
+
+    running_states = load_running_states(path)
+
+    for file in glob.glob(path + 'evaluation/*.pkl'):
+        with open(file, 'rb') as f:
+            running_states[int(os.path.basename(file)[:-4])] = pickle.load(f)
+
+    save_atomically(running_states, path + 'evaluation_running_states.pkl')
+
+    os.remove(path + 'scores.partial.npy')
+    os.remove(path + 'scores.done.npy')
+
+    shutil.rmtree(path + 'evaluation/', ignore_errors=True)
+
+def load_running_states(path):
+    """
+    Running states of the fully tested bots of the generation at `path`, as {bot : (number of tests, running state)}.
+    """
+    if not os.path.isfile(path + 'evaluation_running_states.pkl'):
+        return {}
+
+    with open(path + 'evaluation_running_states.pkl', 'rb') as f:
+        return pickle.load(f)
+
+def count_done(gen, i):
+    """
+    Number of tests generation `gen`'s i-th bot has already been run on (its scores being recorded).
+    """
+    done = np.load(args.states_path + '/' + str(gen) + '/scores.done.npy', mmap_mode='r')
+
+    nb_done = 0
+
+    while nb_done < args.nb_tests and done[i, nb_done]:
+        nb_done += 1
+
+    return nb_done
+
+def record_scores(gen, i, results):
+    """
+    Record the (test, score, running state) `results` of generation `gen`'s i-th bot.
+    Only one process (the one handing out tasks) writes the incremental score files, which are not kept coherent
+    between processes on network file systems.
+    """
+    if len(results) == 0:
+        return
+
+    path = args.states_path + '/' + str(gen) + '/'
+
+    scores = np.lib.format.open_memmap(path + 'scores.partial.npy', mode='r+')
+    done = np.lib.format.open_memmap(path + 'scores.done.npy', mode='r+')
+
+    for j, score, _ in results:
+        scores[i, j] = score
+
+    scores.flush()
+
+    for j, _, _ in results:
+        done[i, j] = True
+
+    done.flush()
+
+    j, _, running_state = results[-1]
+
+    if running_state != {}:
+        os.makedirs(path + 'evaluation/', exist_ok=True)
+        save_atomically((j + 1, running_state), path + 'evaluation/' + str(i) + '.pkl')
+
+def run_bot(gen, load_state, i, nb_done):
+    """
+    Run generation `gen`'s i-th bot on its remaining tests (those from the `nb_done`-th on), yielding (test, score,
+    running state) as soon as each score is obtained.
+    `load_state` is only called if the bot needs to be loaded from the generation's state.
+    """
+    if nb_done == args.nb_tests:
+        return
+
+    path = args.states_path + '/' + str(gen) + '/'
+
+    if os.path.isfile(path + 'evaluation/' + str(i) + '.pkl'): # Partially tested
+
+        with open(path + 'evaluation/' + str(i) + '.pkl', 'rb') as f:
+            nb_run, running_state = pickle.load(f)
+
+    else: # Previously fully tested (`--nb_tests` increase) or untested
+
+        nb_run, running_state = load_running_states(path).get(i, (0, None))
+
+    if nb_run > nb_done: # Scores lost, the bot has to be tested anew
+        nb_run, running_state = 0, None
+
+    bot = get_bot(load_state(), i)
+
+    if running_state != None:
+
+        for name, value in running_state.items():
+            setattr(bot, name, value)
+
+    elif bot.get_running_state() == {}: # Tests are independent, none needs to be replayed
+        nb_run = nb_done
+
+    bot.setup_to_run()
+
+    standardization = load_standardization(path)
+
+    for j in range(nb_run, args.nb_tests):
+
+        score = run_test(bot, j, standardization)
+
+        if j < nb_done: # Replayed to restore the bot's running state
+            continue
+
+        yield j, score, bot.get_running_state()
+
+"""
+Distribute workload
+"""
+
+profiler = Profiler(rank, args.profile, args.states_path + '/profiles/evaluate/')
+
+if rank == 0 and args.profile != None: # Profiles of previous runs are not to be merged with this run's
+    clear_profiles(args.states_path + '/profiles/evaluate/')
+
+profiler.start()
+
+files = [os.path.basename(x) for x in glob.glob(args.states_path + '/*')]
+
+gens = []
+
+for file in files:
+    if file.isdigit() and os.path.isdir(args.states_path + '/' + file):
+        path = args.states_path + '/' + file + '/'
+        if not os.path.isfile(path + 'scores.npy') or np.load(path + 'scores.npy').shape[1] < args.nb_tests:
+            gens.append( int(file) )
+
+class BotFound(Exception):
+    pass
+
+class StateUnpickler(pickle.Unpickler):
+    """
+    Stops unpickling a state as soon as it reaches one of its bots.
+    """
+    def find_class(self, module, name):
+
+        if module.startswith('bots.'):
+            raise BotFound
+
+        return super().find_class(module, name)
+
+def is_ps_state(gen):
+    """
+    Whether generation `gen`'s state is a 'ps' state (seeds only) without loading its bots if it isn't.
+    """
+    try:
+
+        with open(args.states_path + '/' + str(gen) + '/0.pkl', 'rb') as f:
+            return len(StateUnpickler(f).load()) == 3
+
+    except BotFound:
+
+        return False
+
+# 'ps' states : earlier generations are handed out first for their bots to be extended into those of later generations
+# Other states : later generations (generally made up of bigger nets) are handed out first
+gens.sort(reverse=len(gens) == 0 or not is_ps_state(gens[0]))
+
+class StateLoader:
+    """
+    Loads generations' states on demand, keeping the latest one in memory.
+    The states of upcoming generations can be prefetched, i.e. read by a background thread while the current
+    generation is being evaluated (at most `args.prefetch` of them being held at once), then only unpickled when
+    needed.
+    Unless `read_bots`, only the indexes of indexed states are read, their bots being read as they are accessed (for
+    processes evaluating a few bots of each generation not to read all of them).
+    """
+    def __init__(self, read_bots):
+
+        self.gen = None
+
+        self.read_bots = read_bots
+
+        self.executor = ThreadPoolExecutor(1)
+        self.prefetched = collections.OrderedDict()
+
+    def prefetch(self, gen, upcoming_gens):
+        """
+        Start reading the states of generations `upcoming_gens` (in order) to be evaluated after generation `gen`,
+        dropping those prefetched for other generations.
+        """
+        for prefetched_gen in list(self.prefetched):
+            if prefetched_gen != gen and prefetched_gen not in upcoming_gens:
+                self.prefetched.pop(prefetched_gen).cancel()
+
+        for upcoming_gen in upcoming_gens:
+
+            if len(self.prefetched) - (gen in self.prefetched) >= args.prefetch:
+                break
+
+            if upcoming_gen != self.gen and upcoming_gen not in self.prefetched:
+                self.prefetched[upcoming_gen] = self.executor.submit(read_state, upcoming_gen, self.read_bots)
+
+    def __call__(self, gen):
+
+        def load():
+
+            if self.gen != gen:
+
+                if gen in self.prefetched:
+                    self.state = load_state(self.prefetched.pop(gen).result())
+                else:
+                    self.state = load_state(read_state(gen, self.read_bots))
+
+                self.gen = gen
+
+            return self.state
+
+        return load
+
+# With several processes, each one only evaluates a few bots of each generation
+state_loader = StateLoader(size == 1)
+
+if size == 1:
+
+    for k, gen in enumerate(gens):
+
+        print('Gen : ' + str(gen))
+
+        state_loader.prefetch(gen, gens[k+1:k+1+args.prefetch])
+
+        prepare_scores(gen)
+
+        for i in range(pop_size//2):
+            for result in run_bot(gen, state_loader(gen), i, count_done(gen, i)):
+                record_scores(gen, i, [result])
+
+        complete_scores(gen)
+
+elif rank == 0: # Process 0 distributes (generation, bot) tasks to the other processes as they become available
+
+    for gen in gens:
+        prepare_scores(gen)
+
+    # Generations' remaining bots
+    tasks = collections.OrderedDict([(gen, collections.deque(range(pop_size//2))) for gen in gens])
+
+    nb_completed_tasks = {gen: 0 for gen in gens}
+
+    nb_active_workers = size - 1
+    status = MPI.Status()
+
+    while nb_active_workers > 0:
+
+        result = comm.recv(source=MPI.ANY_SOURCE, status=status)
+        worker = status.Get_source()
+
+        if result is not None:
+
+            gen, i, results = result
+
+            record_scores(gen, i, results)
+
+            nb_completed_tasks[gen] += 1
+
+            if nb_completed_tasks[gen] == pop_size//2:
+                complete_scores(gen)
+                print('Gen : ' + str(gen))
+
+        if len(tasks) == 0:
+
+            comm.send(None, dest=worker)
+            nb_active_workers -= 1
+
+        else:
+
+            # Favour the generation the worker has already loaded
+            if result is None or result[0] not in tasks:
+                gen = next(iter(tasks))
+
+            # Generations the worker is likely to be handed next, for it to prefetch their states
+            upcoming_gens = [upcoming_gen for upcoming_gen in tasks if upcoming_gen != gen][:args.prefetch]
+
+            i = tasks[gen].popleft()
+
+            comm.send((gen, i, count_done(gen, i), upcoming_gens), dest=worker)
+
+            if len(tasks[gen]) == 0:
+                del tasks[gen]
+
+else: # rank != 0:
+
+    comm.send(None, dest=0)
+
+    while True:
+
+        task = comm.recv(source=0)
+
+        if task is None:
+            break
+
+        gen, i, nb_done, upcoming_gens = task
+
+        state_loader.prefetch(gen, upcoming_gens)
 
-        for j in range(args.nb_tests):
+        results = list(run_bot(gen, state_loader(gen), i, nb_done))
 
-            np.random.seed(MAX_INT-j)
-            torch.manual_seed(MAX_INT-j)
-            random.seed(MAX_INT-j)
-            bot.reset()
-            
-            emulator.seed(MAX_INT-j)
-            obs = emulator.reset()
-            done = False
+        comm.send((gen, i, results), dest=0)
 
-            for k in range(args.nb_obs_per_test):
+profiler.stop()
 
-                obs, rew, done, _ = emulator.step( bot(obs) )
+if args.profile != None:
 
-                scores[i][j] += rew
+    profiler.dump()
 
-                if done:
-                    break
+    comm.Barrier() # Waits for all profiles to be dumped
 
-    np.save(path + 'scores.npy', scores)
\ No newline at end of file
+    if rank == 0:
+        summarize(args.states_path + '/profiles/evaluate/')
@@ -1,5 +1,5 @@
-import gym
 import numpy as np
+import os
 
 def control_task_name(task):
 
@@ -44,6 +44,54 @@ def control_task_name(task):
     else:
         raise RuntimeError('Task: ' + task + ' not supported.')
 
+def step(emulator, action, action_repeat=1):
+    """
+    Apply an action for `action_repeat` emulator steps (or until the episode ends), summing up the rewards.
+    Only the last observation is returned, bots therefore only observe (and update their running
+    observation statistics on) one observation per action.
+    Also returns the number of emulator steps taken.
+    """
+    rew = 0
+
+    for nb_steps in range(1, action_repeat + 1):
+
+        obs, step_rew, done, info = emulator.step(action)
+
+        rew += step_rew
+
+        if done:
+            break
+
+    return obs, rew, done, info, nb_steps
+
+def get_standardization(observation_stats):
+    """
+    Shift & scale (stacked) standardizing observations, as `(obs - shift) * scale`, given their statistics : their
+    count, sums & sums of squares concatenated.
+    """
+    d_input = (len(observation_stats) - 1) // 2
+
+    count, sums, squared_sums = observation_stats[0], observation_stats[1:d_input+1], observation_stats[d_input+1:]
+
+    if count == 0:
+        return np.stack((np.zeros(d_input), np.ones(d_input)))
+
+    mean = sums / count
+    std = np.sqrt( np.maximum(squared_sums / count - mean ** 2, 0) )
+
+    return np.stack((mean, 1 / (std + (std == 0))))
+
+def load_standardization(state_path):
+    """
+    Standardization of the observations by the shared statistics ('shared' normalization) the bots of the state saved
+    in directory `state_path` were evaluated with (None if the bots standardize their observations themselves).
+    """
+    for name in ['evaluation_observation_statistics', 'observation_statistics']: # Older states : the latter only
+        if os.path.isfile(state_path + name + '.npy'):
+            return get_standardization(np.load(state_path + name + '.npy'))
+
+    return None
+
 def get_info(task):
 
     discrete_output = False
@@ -1,6 +1,8 @@
 import json
 import numpy as np
 import os
+import random
+import sys
 from importlib import import_module
 
 def initialize_environment(args, rank, size):
@@ -16,6 +18,47 @@ def initialize_environment(args, rank, size):
 
     return getattr( import_module( args.env_path.replace('/', '.').replace('.py', '') ), 'Env' )(args, rank, size)
 
+def initialize_communication(args):
+
+    return getattr( import_module( 'comms.' + args.backend ), 'Comm' )(args)
+
+def parse_additional_arguments(additional_arguments):
+    """
+    Recover the additional arguments from their state path representation.
+    <=> 'key_0.value_0~key_1.value_1~...~key_n.value_n'
+    """
+    arguments = {}
+
+    for argument in additional_arguments.split('~'):
+
+        if argument == '':
+            continue
+
+        key, value = argument.split('.', 1)
+
+        arguments[key] = int(value) if value.isdigit() else value
+
+    return arguments
+
+def set_nb_intra_op_threads(nb_threads):
+    """
+    Set the number of threads used by PyTorch's intra-op parallelism (only if PyTorch is in use).
+    """
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(nb_threads)
+
+def set_seeds(seed):
+    """
+    Seed Python's, NumPy's & PyTorch's random number generators.
+    PyTorch is only seeded if it is in use (bots & nets making use of it import it beforehand), so that processes that
+    don't need it never have to load it.
+    """
+    np.random.seed(seed)
+    random.seed(seed)
+
+    if 'torch' in sys.modules:
+        sys.modules['torch'].manual_seed(seed)
+
 def deterministic_set(x):
 
     set = list( dict.fromkeys(x) )
@@ -0,0 +1,148 @@
+import json
+import numpy as np
+import os
+import time
+
+class Monitor:
+    """
+    Lightweight per-process phase timers & counters.
+    Every generation, all processes' timers & counters are gathered by the primary process which appends them (one
+    value per process) as a JSON line to the log file.
+    Env steps & bytes sent/received are counted automatically.
+
+    :param comm: Communicator.
+    :type comm: CommBase
+    :param env: Environment.
+    :type env: EnvBase
+    :param rank: Rank of this process.
+    :type rank: int
+    :param path: Path to the log file (JSONL), monitoring is disabled if None.
+    :type path: string
+    """
+    def __init__(self, comm, env, rank, path):
+
+        self.comm = comm
+        self.env = env
+        self.rank = rank
+        self.path = path
+
+        self.reset()
+
+    def reset(self):
+
+        self.phases = {}
+        self.counters = {}
+        self.records = {}
+
+        self.nb_steps = self.env.nb_steps
+        self.nb_bytes_sent = self.comm.nb_bytes_sent
+        self.nb_bytes_received = self.comm.nb_bytes_received
+
+        self.phase_name = None
+        self.phase_start = self.start = time.perf_counter()
+
+    def phase(self, name):
+        """
+        Start timing phase `name` (ending the current one). Phases can be entered multiple times per generation.
+        """
+        if self.path == None:
+            return
+
+        now = time.perf_counter()
+
+        if self.phase_name != None:
+            self.phases[self.phase_name] = self.phases.get(self.phase_name, 0) + now - self.phase_start
+
+        self.phase_name = name
+        self.phase_start = now
+
+    def time(self, name, duration):
+        """
+        Add `duration` (in seconds) to phase `name`, for phases timed outside of the monitor (e.g. before its creation).
+        """
+        if self.path == None:
+            return
+
+        self.phases[name] = self.phases.get(name, 0) + duration
+
+    def count(self, name, value):
+        """
+        Add `value` to counter `name`.
+        """
+        if self.path == None:
+            return
+
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, name, value):
+        """
+        Log JSON serializable `value` as is under `name` (primary process).
+        """
+        if self.path == None:
+            return
+
+        self.records[name] = value
+
+    def log(self, gen_nb):
+        """
+        End the current phase, gather all processes' timers & counters and log them (primary process).
+        """
+        if self.path == None:
+            return
+
+        self.phase(None)
+
+        self.count('nb_steps', self.env.nb_steps - self.nb_steps)
+        self.count('nb_bytes_sent', self.comm.nb_bytes_sent - self.nb_bytes_sent)
+        self.count('nb_bytes_received', self.comm.nb_bytes_received - self.nb_bytes_received)
+
+        stats = {'time': time.perf_counter() - self.start, 'phases': self.phases, 'counters': self.counters}
+
+        processes_stats = self.comm.gather(stats, root=0)
+
+        if self.rank == 0:
+
+            entry = {'generation': gen_nb, 'time': [stats['time'] for stats in processes_stats]}
+
+            for key in ['phases', 'counters']:
+
+                names = []
+
+                for stats in processes_stats:
+                    names += [name for name in stats[key] if name not in names]
+
+                entry[key] = {name: [stats[key].get(name, 0) for stats in processes_stats] for name in names}
+
+            entry.update(self.records)
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+        self.reset()
+
+def summarize_bot_stats(bot_stats, names, nb_bins=10):
+    """
+    Population histograms of the bots' structural statistics.
+
+    :param bot_stats: Statistics of all bots, of shape (population_size, nb_populations, nb_statistics).
+    :type bot_stats: np.ndarray
+    :param names: Names of the statistics.
+    :type names: list
+    """
+    summary = {}
+
+    for k, name in enumerate(names):
+
+        values = bot_stats[..., k].ravel()
+
+        counts, edges = np.histogram(values, bins=nb_bins)
+
+        summary[name] = {'min': float(values.min()),
+                         'mean': float(values.mean()),
+                         'max': float(values.max()),
+                         'counts': counts.tolist(),
+                         'edges': edges.tolist()}
+
+    return summary
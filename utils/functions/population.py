@@ -0,0 +1,171 @@
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+class PopulationStore:
+    """
+    Out-of-core counterpart of a process' batch of bots (`bots_batch` : one list of bots per entry).
+    Idle entries are kept pickled (compact form), in RAM as long as their combined size fits within `budget`, spilled
+    to a local file each otherwise. Entries are paged in (unpickled) when accessed, the next one to be accessed can be
+    prefetched (its spill file read) by a background thread so as to overlap with the current evaluation, unpickling,
+    which holds the GIL, being left to the access.
+    Entries are stored by value : an accessed entry that is modified (e.g. extended) needs to be stored back.
+    Entries can also be accessed & stored in their pickled form (e.g. to be exchanged between processes or saved as
+    is).
+
+    :param budget: RAM budget (in bytes) of the idle pickled bots.
+    :type budget: int
+    :param path: Directory in which to create the spill files (system's temporary directory if None).
+    :type path: string
+    """
+    def __init__(self, budget, path=None):
+
+        if budget < 0:
+            raise RuntimeError("Memory budget must be >= 0.")
+
+        self.budget = budget
+
+        self.directory = tempfile.TemporaryDirectory(prefix='population_', dir=path) # Removed upon exit
+
+        self.entries = [] # Pickled bots (RAM) or None (spilled)
+        self.sizes = [] # Pickled size of each entry
+
+        self.nb_resident_bytes = 0
+
+        self.executor = ThreadPoolExecutor(1)
+        self.prefetched = {}
+
+    def get_spill_path(self, i):
+
+        return self.directory.name + '/' + str(i) + '.bots'
+
+    def __len__(self):
+
+        return len(self.entries)
+
+    def __setitem__(self, i, bots):
+
+        self.set_pickled(i, pickle.dumps(bots))
+
+    def set_pickled(self, i, pickled_bots):
+
+        self.cancel_prefetch(i)
+
+        self.free(i)
+
+        self.sizes[i] = len(pickled_bots)
+
+        if self.nb_resident_bytes + self.sizes[i] <= self.budget:
+
+            self.entries[i] = pickled_bots
+
+            self.nb_resident_bytes += self.sizes[i]
+
+        else: # Spilled
+
+            with open(self.get_spill_path(i), 'wb') as f:
+                f.write(pickled_bots)
+
+    def append(self, bots):
+
+        self.entries.append(None)
+        self.sizes.append(0)
+
+        self[len(self) - 1] = bots
+
+    def free(self, i):
+        """
+        Release the storage of entry `i`.
+        """
+        if self.entries[i] != None:
+
+            self.nb_resident_bytes -= self.sizes[i]
+
+            self.entries[i] = None
+
+        elif os.path.isfile(self.get_spill_path(i)):
+
+            os.remove(self.get_spill_path(i))
+
+    def get_pickled(self, i):
+
+        if self.entries[i] != None:
+            return self.entries[i]
+
+        with open(self.get_spill_path(i), 'rb') as f:
+            return f.read()
+
+    def load(self, i):
+
+        return pickle.loads(self.get_pickled(i))
+
+    def __getitem__(self, i):
+
+        if i in self.prefetched:
+            return pickle.loads(self.prefetched.pop(i).result())
+
+        return self.load(i)
+
+    def __iter__(self):
+
+        for i in range(len(self)):
+            yield self[i]
+
+    def prefetch(self, i):
+        """
+        Start reading entry `i` from its spill file on the background thread (no-op if out of range or not spilled).
+        """
+        if i < len(self) and self.entries[i] == None and i not in self.prefetched:
+            self.prefetched[i] = self.executor.submit(self.get_pickled, i)
+
+    def cancel_prefetch(self, i):
+
+        if i in self.prefetched:
+            self.prefetched.pop(i).result() # Waits for the file to be released
+
+    def get_size(self, i):
+        """
+        Pickled size of entry `i`.
+        """
+        return self.sizes[i]
+
+    def iterate_pickled(self):
+        """
+        Iterate over the entries in their pickled form, one at a time (e.g. to be saved as is).
+        """
+        for i in range(len(self)):
+            yield self.get_pickled(i)
+
+def gather_pickled(comm, store, max_nb_bytes=None):
+    """
+    Gather all processes' entries of `store` (same number on every process) on process 0, in their pickled form.
+    Returns, on process 0, an iterator over all pickled entries (process by process), each one only being received
+    as it is iterated over (the iterator needs to be exhausted), None on other processes, whose entries are streamed
+    within `max_nb_bytes` (see *CommBase.exchange*).
+    """
+    rank = comm.Get_rank()
+
+    if rank != 0:
+
+        sends = [(lambda i=i: store.get_pickled(i), 0, len(store) * rank + i) for i in range(len(store))]
+
+        comm.exchange(sends, [], max_nb_bytes=max_nb_bytes)
+
+        return None
+
+    def receive():
+
+        yield from store.iterate_pickled()
+
+        for source in range(1, comm.Get_size()):
+
+            for i in range(len(store)):
+
+                received = []
+
+                comm.exchange([], [(received.append, source, len(store) * source + i)])
+
+                yield received[0]
+
+    return receive()
@@ -0,0 +1,79 @@
+import cProfile
+import glob
+import io
+import os
+import pstats
+
+class Profiler:
+    """
+    Deterministic (cProfile) profiler of selected processes.
+    Profiling can be started & stopped multiple times (e.g. only on some generations), each selected process dumps
+    its profile in the end, to be merged by *summarize*.
+
+    :param rank: Rank of this process.
+    :type rank: int
+    :param ranks: Ranks of the processes to profile (None : no profiling, [] : all processes).
+    :type ranks: list
+    :param path: Path to the directory to dump the profiles into.
+    :type path: string
+    """
+    def __init__(self, rank, ranks, path):
+
+        self.rank = rank
+        self.path = path
+
+        self.profile = None
+
+        if ranks != None and (len(ranks) == 0 or rank in ranks):
+            self.profile = cProfile.Profile()
+
+    def start(self):
+
+        if self.profile != None:
+            self.profile.enable()
+
+    def stop(self):
+
+        if self.profile != None:
+            self.profile.disable()
+
+    def dump(self):
+
+        if self.profile != None:
+
+            os.makedirs(self.path, exist_ok=True)
+
+            self.profile.dump_stats(self.path + str(self.rank) + '.prof')
+
+def clear_profiles(path):
+    """
+    Remove the profiles (and their summary) dumped in directory `path` by previous runs, so that *summarize* only
+    merges those of the current run. To be called by a single process, before any profile is dumped.
+    """
+    for file_path in glob.glob(path + '*.prof') + [path + 'summary.txt', path + 'merged.pstats']:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
+def summarize(path, nb_functions=40):
+    """
+    Merge all profiles dumped in directory `path` into a summary of the hottest functions (summary.txt) and a merged
+    profile (merged.pstats, e.g. for visualization tools).
+    """
+    profile_paths = sorted(glob.glob(path + '*.prof'))
+
+    if len(profile_paths) == 0:
+        return
+
+    stream = io.StringIO()
+
+    stats = pstats.Stats(*profile_paths, stream=stream)
+
+    stream.write('Profiles merged : ' + ', '.join([os.path.basename(x) for x in profile_paths]) + '\n')
+
+    stats.sort_stats('tottime').print_stats(nb_functions)
+    stats.sort_stats('cumulative').print_stats(nb_functions)
+
+    with open(path + 'summary.txt', 'w') as f:
+        f.write(stream.getvalue())
+
+    stats.dump_stats(path + 'merged.pstats')
@@ -0,0 +1,381 @@
+import hashlib
+import io
+import mmap
+import numpy as np
+import os
+import pickle
+import sys
+import time
+
+"""
+Indexed state layout
+
+Instead of being pickled along with the rest of a process' state (<rank>.pkl), its bots are pickled one by one, back
+to back, into <rank>.bots and indexed (offset, size & fitness of each bot) in <rank>.index.npy.
+The state's last element (its bots) is replaced by None in <rank>.pkl.
+Any single bot can then be unpickled through a memory map of <rank>.bots without reading the rest of the file.
+
+Deduplicated state layout
+
+Bots are pickled one by one into a content-addressed store shared by all generations of an experiment
+(<population_size>/objects/, one file per distinct pickled bot, named after its SHA-256 hash), each bot being only
+written if no identical bot was saved before (e.g. unmutated elites).
+Bots are pickled canonically (PyTorch tensors as NumPy arrays, PyTorch otherwise pickling the memory addresses of
+their storages) so that identical bots are pickled identically.
+Their running states (attributes updated when they are run, e.g. running observation statistics, see
+*BotBase.get_running_state*) are left out of the store, as they change every time a bot (e.g. a reevaluated elite) is
+run, and pickled into the manifest instead.
+A process' bots are listed (hash, size, fitness & running state of each bot) in <rank>.manifest.npy, the state's last
+element being replaced by None in <rank>.pkl.
+Objects no longer listed by any manifest (e.g. once generations are thinned out) are removed by *collect_garbage*.
+"""
+
+def select(fitnesses):
+    """
+    Positions of the bots selected (top half) at the end of a generation according to their `fitnesses`.
+    """
+    fitnesses_sorting_indices = fitnesses.argsort(axis=0)
+    fitnesses_rankings = fitnesses_sorting_indices.argsort(axis=0)
+    selected = np.greater_equal(fitnesses_rankings, len(fitnesses)//2)
+
+    return np.where(selected[:,0] == True)[0]
+
+def index_dtype(nb_populations):
+
+    return np.dtype([('offset', np.uint64), ('size', np.uint64), ('fitness', np.float32, (nb_populations,))])
+
+def manifest_dtype(nb_populations, running_state_size):
+
+    return np.dtype([('hash', 'S64'), ('size', np.uint64), ('fitness', np.float32, (nb_populations,)),
+                     ('running_state', 'S' + str(running_state_size))])
+
+def save_indexed_state(path, rank, state, fitnesses, pickled=False):
+    """
+    Save a process' state, its bots (last element of `state`, iterated over once) being saved one by one and indexed.
+    If `pickled`, the bots are already pickled and written as is.
+    """
+    index = np.zeros(len(fitnesses), dtype=index_dtype(fitnesses.shape[1]))
+
+    offset = 0
+
+    with open(path + str(rank) + '.bots', 'wb') as f:
+
+        for i, bot in enumerate(state[-1]):
+
+            pickled_bot = bot if pickled else pickle.dumps(bot)
+
+            f.write(pickled_bot)
+
+            index[i] = (offset, len(pickled_bot), fitnesses[i])
+
+            offset += len(pickled_bot)
+
+    np.save(path + str(rank) + '.index.npy', index)
+
+    # Saved last, <rank>.pkl marks the state as complete
+    with open(path + str(rank) + '.pkl', 'wb') as f:
+        pickle.dump(state[:-1] + [None], f)
+
+def remove_indexed_state(path, rank):
+    """
+    Remove a process' indexed bots (left over by a previous save of the same generation).
+    """
+    for extension in ['.bots', '.index.npy', '.manifest.npy']:
+        if os.path.isfile(path + str(rank) + extension):
+            os.remove(path + str(rank) + extension)
+
+def get_objects_path(path):
+    """
+    Path to the content-addressed store of the experiment whose generation `path` belongs to.
+    """
+    return os.path.dirname(os.path.normpath(path)) + '/objects/'
+
+def get_object_path(objects_path, hash):
+
+    return objects_path + hash + '.pkl'
+
+def rebuild_tensor(array, parameter, requires_grad):
+    """
+    Rebuild a PyTorch tensor (or parameter) pickled by *CanonicalPickler*.
+    """
+    import torch
+
+    tensor = torch.from_numpy(array)
+
+    if parameter:
+        return torch.nn.Parameter(tensor, requires_grad=requires_grad)
+
+    return tensor.requires_grad_(requires_grad)
+
+class CanonicalPickler(pickle.Pickler):
+    """
+    Pickler whose output only depends on the content of the objects pickled : CPU PyTorch tensors are pickled as
+    NumPy arrays.
+    """
+    def reducer_override(self, obj):
+
+        torch = sys.modules['torch']
+
+        if type(obj) in [torch.Tensor, torch.nn.Parameter] and obj.device.type == 'cpu':
+
+            try:
+                array = obj.detach().numpy()
+            except TypeError: # No NumPy counterpart (e.g. bfloat16)
+                return NotImplemented
+
+            return rebuild_tensor, (array, isinstance(obj, torch.nn.Parameter), obj.requires_grad)
+
+        return NotImplemented
+
+def pickle_canonically(obj):
+
+    if 'torch' not in sys.modules:
+        return pickle.dumps(obj)
+
+    f = io.BytesIO()
+
+    CanonicalPickler(f).dump(obj)
+
+    return f.getvalue()
+
+def pickle_apart_running_states(bots):
+    """
+    Pickle `bots` (list of bots) canonically without their running states (see *BotBase.get_running_state*), these
+    being pickled apart. Returns both pickles, `bots` being left unchanged.
+    """
+    running_states = [bot.get_running_state() for bot in bots]
+
+    for bot, running_state in zip(bots, running_states):
+        for name in running_state:
+            delattr(bot, name)
+
+    pickled_bots = pickle_canonically(bots)
+
+    for bot, running_state in zip(bots, running_states):
+        for name, value in running_state.items():
+            setattr(bot, name, value)
+
+    return pickled_bots, pickle.dumps(running_states)
+
+def save_deduplicated_state(path, rank, state, fitnesses, pickled=False):
+    """
+    Save a process' state, its bots (last element of `state`, iterated over once) being saved one by one into the
+    content-addressed store (only those not already in it) and listed in a manifest.
+    If `pickled`, the bots are already pickled and unpickled one at a time (to be pickled canonically).
+    """
+    objects_path = get_objects_path(path)
+
+    hashes, sizes, pickled_running_states = [], [], []
+
+    for bot in state[-1]:
+
+        pickled_bot, pickled_running_state = pickle_apart_running_states(pickle.loads(bot) if pickled else bot)
+
+        hash = hashlib.sha256(pickled_bot).hexdigest()
+
+        object_path = get_object_path(objects_path, hash)
+
+        if not os.path.isfile(object_path):
+
+            os.makedirs(objects_path, exist_ok=True)
+
+            # Written under a process-specific name then renamed (atomic), for processes saving the same bot
+            with open(object_path + '.' + str(rank) + '.tmp', 'wb') as f:
+                f.write(pickled_bot)
+
+            os.replace(object_path + '.' + str(rank) + '.tmp', object_path)
+
+        hashes.append(hash)
+        sizes.append(len(pickled_bot))
+        pickled_running_states.append(pickled_running_state)
+
+    running_state_size = max(len(pickled_running_state) for pickled_running_state in pickled_running_states)
+
+    manifest = np.zeros(len(fitnesses), dtype=manifest_dtype(fitnesses.shape[1], running_state_size))
+
+    manifest['hash'] = hashes
+    manifest['size'] = sizes
+    manifest['fitness'] = fitnesses
+    manifest['running_state'] = pickled_running_states
+
+    for extension in ['.bots', '.index.npy']:
+        if os.path.isfile(path + str(rank) + extension):
+            os.remove(path + str(rank) + extension)
+
+    np.save(path + str(rank) + '.manifest.npy', manifest)
+
+    # Saved last, <rank>.pkl marks the state as complete
+    with open(path + str(rank) + '.pkl', 'wb') as f:
+        pickle.dump(state[:-1] + [None], f)
+
+def is_deduplicated_state(path, rank=0):
+
+    return os.path.isfile(path + str(rank) + '.manifest.npy')
+
+def is_indexed_state(path, rank=0):
+    """
+    Whether a process' bots were saved one by one (indexed or deduplicated layout).
+    """
+    return os.path.isfile(path + str(rank) + '.index.npy') or is_deduplicated_state(path, rank)
+
+def load_index(path, rank):
+    """
+    Index (indexed layout) or manifest (deduplicated layout) of a process' bots, both listing their fitnesses.
+    """
+    if is_deduplicated_state(path, rank):
+        return np.load(path + str(rank) + '.manifest.npy', mmap_mode='r')
+
+    return np.load(path + str(rank) + '.index.npy', mmap_mode='r')
+
+def read_indexed_bots(path, rank, positions=None):
+    """
+    Iterate over a process' pickled bots (all of them or only those at `positions`), read without being unpickled
+    (see *unpickle_indexed_bots*), as (pickled bots, pickled running states) pairs, the latter being None unless saved
+    apart from the bots (deduplicated layout).
+    """
+    index = load_index(path, rank)
+
+    if positions is None:
+        positions = range(len(index))
+
+    if is_deduplicated_state(path, rank):
+
+        objects_path = get_objects_path(path)
+
+        for position in positions:
+
+            with open(get_object_path(objects_path, index[position]['hash'].decode()), 'rb') as f:
+                pickled_bot = f.read()
+
+            if 'running_state' in index.dtype.names:
+                yield pickled_bot, bytes(index[position]['running_state'])
+            else: # Older manifests : running states stored along with the bots
+                yield pickled_bot, None
+
+        return
+
+    with open(path + str(rank) + '.bots', 'rb') as f:
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as bots_file:
+
+            for position in positions:
+
+                offset, size = int(index[position]['offset']), int(index[position]['size'])
+
+                yield bots_file[offset:offset+size], None
+
+def unpickle_indexed_bots(pickled_bot, pickled_running_state=None):
+    """
+    Unpickle bots read by *read_indexed_bots*, setting their running states back (if saved apart from them).
+    """
+    bot = pickle.loads(pickled_bot)
+
+    if pickled_running_state != None:
+
+        for bot_i, running_state in zip(bot, pickle.loads(pickled_running_state)):
+            for name, value in running_state.items():
+                setattr(bot_i, name, value)
+
+    return bot
+
+def load_indexed_bots(path, rank, positions=None):
+    """
+    Load a process' bots (all of them or only those at `positions`).
+    """
+    return [unpickle_indexed_bots(*pickled_bot) for pickled_bot in read_indexed_bots(path, rank, positions)]
+
+def collect_garbage(states_path, tmp_grace_period=3600):
+    """
+    Remove the objects of the content-addressed store of `states_path` (<...>/<population_size>/) that are not listed
+    by any of its generations' manifests. Returns the number of objects & bytes freed.
+    Temporary files (objects being written by a save in progress) are only removed once left untouched for
+    `tmp_grace_period` seconds (leftovers of interrupted saves).
+    """
+    objects_path = states_path + '/objects/'
+
+    if not os.path.isdir(objects_path):
+        return 0, 0
+
+    hashes = set()
+
+    for gen in os.listdir(states_path):
+
+        if not gen.isdigit() or not os.path.isdir(states_path + '/' + gen):
+            continue
+
+        rank = 0
+
+        while is_deduplicated_state(states_path + '/' + gen + '/', rank):
+
+            manifest = load_index(states_path + '/' + gen + '/', rank)
+
+            hashes.update( manifest['hash'].astype(str) )
+
+            rank += 1
+
+    nb_objects, nb_bytes = 0, 0
+
+    for file in os.listdir(objects_path):
+
+        if file.endswith('.pkl') and file[:-4] in hashes:
+            continue
+
+        try:
+
+            if file.endswith('.tmp') and time.time() - os.path.getmtime(objects_path + file) < tmp_grace_period:
+                continue
+
+            nb_file_bytes = os.path.getsize(objects_path + file)
+
+            os.remove(objects_path + file)
+
+        except FileNotFoundError: # Renamed or removed by the save in progress in the meantime
+            continue
+
+        nb_objects += 1
+        nb_bytes += nb_file_bytes
+
+    return nb_objects, nb_bytes
+
+class IndexedBots:
+    """
+    Bots of all of a generation's processes, each bot being only loaded when accessed.
+    Their fitnesses are read from the indexes.
+
+    :param path: Path to the generation's state.
+    :type path: string
+    """
+    def __init__(self, path):
+
+        self.path = path
+
+        nb_processes = 0
+
+        while is_indexed_state(path, nb_processes):
+            nb_processes += 1
+
+        indexes = [load_index(path, rank) for rank in range(nb_processes)]
+
+        self.ranks = np.concatenate([np.full(len(index), rank) for rank, index in enumerate(indexes)])
+        self.positions = np.concatenate([np.arange(len(index)) for index in indexes])
+
+        self.fitnesses = np.concatenate([index['fitness'] for index in indexes])
+
+    def __len__(self):
+
+        return len(self.ranks)
+
+    def __getitem__(self, i):
+
+        return unpickle_indexed_bots(*self.read([i])[0])
+
+    def read(self, indices):
+        """
+        Read the bots at `indices` without unpickling them (see *read_indexed_bots*).
+        """
+        pickled_bots = []
+
+        for i in indices:
+            pickled_bots += read_indexed_bots(self.path, self.ranks[i], [self.positions[i]])
+
+        return pickled_bots
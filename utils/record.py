@@ -3,15 +3,15 @@ import glob
 import numpy as np
 import os
 import pickle
-import random
 import sys
-import torch
 import warnings
 
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/..')
 
+from utils.functions.misc import parse_additional_arguments, set_seeds
+from utils.functions.states import IndexedBots, is_indexed_state, select
+
 warnings.filterwarnings("ignore", category=UserWarning)
-sys.setrecursionlimit(2**31-1)
 
 parser = argparse.ArgumentParser()
 
@@ -30,12 +30,12 @@ MAX_INT = 2**31-1
 Process arguments
 """
 
-if not os.path.isfile(args.state_path + 'scores.npy'):
-    raise RuntimeError('This state has not yet been evaluated. Please run `utils/evaluate.py`.')
-
 if args.state_path[-1] == '/':
     args.state_path = args.state_path[:-1]
 
+if not os.path.isfile(args.state_path + '/scores.npy'):
+    raise RuntimeError('This state has not yet been evaluated. Please run `utils/evaluate.py`.')
+
 split_path = args.state_path.split('/')
 
 env_path = split_path[-5]
@@ -44,10 +44,11 @@ bots_path = split_path[-3]
 pop_size = int(split_path[-2])
 gen_nb = int(split_path[-1])
 
-split_additional_arguments = additional_arguments.split('~')
+additional_arguments = parse_additional_arguments(additional_arguments)
 
-task = split_additional_arguments[0].split('.')[1]
-trials = split_additional_arguments[1].split('.')[1]
+task = additional_arguments['task']
+trials = additional_arguments['trials']
+action_repeat = additional_arguments.get('action_repeat', 1)
 
 """
 Initialize environment
@@ -55,7 +56,7 @@ Initialize environment
 
 import gym
 from gym import wrappers
-from utils.functions.gym import control_task_name
+from utils.functions.gym import control_task_name, load_standardization, step
 
 emulator = gym.make( control_task_name(task) )
 
@@ -74,71 +75,68 @@ else: # 'dynamic.rnn' in bots_path:
 Find elite
 """
 
-pkl_files = [os.path.basename(x) for x in glob.glob(args.state_path + '/*.pkl')]
+scores = np.load(args.state_path + '/scores.npy')
+
+i = scores.mean(axis=1).argmax()
 
-state_files = []
+if is_indexed_state(args.state_path + '/'): # Only the elite is loaded
 
-for pkl_file in pkl_files:
+    bots = IndexedBots(args.state_path + '/')
 
-    if pkl_file[:-4].isdigit():
+    bot = bots[select(bots.fitnesses)[i]][0]
 
-        state_files.append(pkl_file)
+else:
 
-if len(state_files) == 0:
-    raise RuntimeError("Directory '" + args.state_path + "/' empty.")
+    pkl_files = [os.path.basename(x) for x in glob.glob(args.state_path + '/*.pkl')]
 
-try:
+    state_files = []
 
-    with open(args.state_path + '/0.pkl', 'rb') as f:
-        state = pickle.load(f)
+    for pkl_file in pkl_files:
 
-except IOError:
+        if pkl_file[:-4].isdigit():
 
-    print("File '" + args.state_path + "/0.pkl' doesn't exist / is corrupted.")
+            state_files.append(pkl_file)
 
-if len(args.state_path) == 3:
+    if len(state_files) == 0:
+        raise RuntimeError("Directory '" + args.state_path + "/' empty.")
 
-    full_seed_list, _, _ = state
+    try:
 
-else: # len(state) == 4:
+        with open(args.state_path + '/0.pkl', 'rb') as f:
+            state = pickle.load(f)
 
-    _, _, latest_fitnesses_and_bot_sizes, bots = state
+    except IOError:
 
-    for i in range( 1, len(state_files) ):
+        print("File '" + args.state_path + "/0.pkl' doesn't exist / is corrupted.")
 
-        try:
+    if len(state) == 3:
 
-            with open(args.state_path + '/' + str(i) + '.pkl', 'rb') as f:
-                bots += pickle.load(f)[0]
+        full_seed_list, _, _ = state
 
-        except IOError:
+        bot = Bot(argparse.Namespace(additional_arguments=additional_arguments, enable_gpu_use=0), 0, 0, 1)
+        bot.build(full_seed_list[i][0])
 
-            print("File '" + args.state_path + '/' + str(i) + ".pkl' doesn't exist / is corrupted.")
+    else: # len(state) == 4:
 
-    fitnesses_sorting_indices = latest_fitnesses_and_bot_sizes[:, :, 0].argsort(axis=0)
-    fitnesses_rankings = fitnesses_sorting_indices.argsort(axis=0)
-    selected = np.greater_equal(fitnesses_rankings, pop_size//2)
-    selected_indices = np.where(selected[:,0] == True)[0]
+        _, _, latest_fitnesses_and_bot_sizes, bots = state
 
-scores = np.load(args.state_path + '/scores.npy')
+        for j in range( 1, len(state_files) ):
 
-i = scores.mean(axis=1).argmax()
+            try:
 
-if len(state) == 3:
+                with open(args.state_path + '/' + str(j) + '.pkl', 'rb') as f:
+                    bots += pickle.load(f)[0]
 
-    bot = Bot(0)
-    bot.build(full_seed_list[i][0])
+            except IOError:
 
-else: # len(state) == 4:
+                print("File '" + args.state_path + '/' + str(j) + ".pkl' doesn't exist / is corrupted.")
 
-    bot = bots[selected_indices[i]][0]
+        bot = bots[select(latest_fitnesses_and_bot_sizes[:, :, 0])[i]][0]
 
 bot.setup_to_run()
 bot.reset()
 
-np.random.seed(MAX_INT)
-torch.manual_seed(MAX_INT)
-random.seed(MAX_INT)
+set_seeds(MAX_INT)
 
 emulator.seed(MAX_INT)
 obs = emulator.reset()
@@ -154,9 +152,15 @@ if 'dynamic.rnn' in bots_path:
 if hasattr(bot, 'n'):
     print("Number of states experienced: ", bot.n)
     
+# 'shared' normalization : Observations are standardized by the population's shared statistics
+standardization = load_standardization(args.state_path + '/')
+
 for k in range(args.nb_obs):
 
-    obs, rew, done, _ = emulator.step( bot(obs) )
+    if standardization is not None:
+        obs = (obs - standardization[0]) * standardization[1]
+
+    obs, rew, done, _, _ = step(emulator, bot(obs), action_repeat)
     score += rew
 
     if done:
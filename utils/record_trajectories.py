@@ -0,0 +1,265 @@
+import argparse
+import glob
+import numpy as np
+import os
+import pickle
+import sys
+import warnings
+from mpi4py import MPI
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+from utils.functions.misc import parse_additional_arguments, set_seeds
+from utils.functions.states import IndexedBots, is_indexed_state, select
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--states_path', '-s', type=str, required=True,
+                    help="Path to the saved states. \
+                          <=> data/states/<env_path>/<additional_arguments>/<bots_path>/<population_size>/")
+
+parser.add_argument('--generations', '-g', type=int, nargs='+', default=None,
+                    help="Generations to record (all saved generations by default).")
+
+parser.add_argument('--bots', '-b', choices=['selected', 'elite'], default='selected',
+                    help="selected : Record all of the generations' selected bots. \
+                          elite : Only record their elite (requires `utils/evaluate.py` to have been run).")
+
+parser.add_argument('--nb_tests', '-t', type=int, default=1,
+                    help="Number of tests to record the bots on (same tests as `utils/evaluate.py`).")
+
+parser.add_argument('--nb_obs_per_test', '-o', type=int, default=2**31-1,
+                    help="Number of observations to record the bots on per test.")
+
+parser.add_argument('--render', '-r', type=int, default=0,
+                    help="Instead of running bots, renders videos of the already recorded trajectories by replaying \
+                          their actions.")
+
+args = parser.parse_args()
+
+comm = MPI.COMM_WORLD
+rank = comm.Get_rank()
+size = comm.Get_size()
+
+MAX_INT = 2**31-1
+
+"""
+Process arguments
+"""
+
+if args.states_path[-1] == '/':
+    args.states_path = args.states_path[:-1]
+
+split_path = args.states_path.split('/')
+
+env_path = split_path[-4]
+additional_arguments = split_path[-3]
+bots_path = split_path[-2]
+pop_size = int(split_path[-1])
+
+additional_arguments = parse_additional_arguments(additional_arguments)
+
+task = additional_arguments['task']
+action_repeat = additional_arguments.get('action_repeat', 1)
+
+"""
+Initialize environment (once per process, seeded anew for every test)
+"""
+
+import gym
+from utils.functions.gym import control_task_name, load_standardization, step
+
+emulator = gym.make( control_task_name(task) )
+
+"""
+Import bots
+"""
+
+if 'static.rnn' in bots_path:
+    from bots.static.rnn.control import Bot
+else: # 'dynamic.rnn' in bots_path:
+    from bots.dynamic.rnn.control import Bot
+
+# Arguments of the bots built from their seeds ('ps' states)
+bot_args = argparse.Namespace(additional_arguments=additional_arguments, enable_gpu_use=0)
+
+"""
+Trajectories
+
+Each recorded bot gets its own archive <generation>/trajectories/<bot>.npz made up of columns concatenating all of its
+tests' timesteps (observations fed to the bot, its actions & the resulting rewards) and of the offsets at which each
+test starts (test j <=> timesteps offsets[j] to offsets[j+1]).
+"""
+
+def load_state(gen):
+    """
+    Load generation `gen`'s saved state.
+    Returns the seed lists of its bots ('ps' states) or its selected bots ('ps_p2p' and 'big_ps_p2p' states, lazily
+    loaded if indexed).
+    """
+    path = args.states_path + '/' + str(gen) + '/'
+
+    if is_indexed_state(path):
+
+        bots = IndexedBots(path)
+
+        return [bots, select(bots.fitnesses)]
+
+    with open(path + '0.pkl', 'rb') as f:
+        state = pickle.load(f)
+
+    if len(state) == 3:
+
+        full_seed_list, _, _ = state
+
+        return full_seed_list
+
+    _, _, latest_fitnesses_and_bot_sizes, bots = state
+
+    for j in range( 1, len(glob.glob(path + '[0-9]*.pkl')) ):
+
+        with open(path + str(j) + '.pkl', 'rb') as f:
+            bots += pickle.load(f)[0]
+
+    return [bots, select(latest_fitnesses_and_bot_sizes[:, :, 0])]
+
+loaded_gen, loaded_state = None, None
+
+def load_bot(gen, i):
+    """
+    Load generation `gen`'s i-th selected bot (keeping the latest generation's state in memory).
+    """
+    global loaded_gen, loaded_state
+
+    if loaded_gen != gen:
+        loaded_state, loaded_gen = load_state(gen), gen
+
+    if isinstance(loaded_state, np.ndarray): # 'ps' state
+
+        bot = Bot(bot_args, rank, 0, 1)
+        bot.build(loaded_state[i][0])
+
+        return bot
+
+    bots, selected_indices = loaded_state
+
+    return bots[selected_indices[i]][0]
+
+def record(gen, i):
+    """
+    Run generation `gen`'s i-th selected bot on the tests and save its trajectories.
+    """
+    archive_path = args.states_path + '/' + str(gen) + '/trajectories/' + str(i) + '.npz'
+
+    if os.path.isfile(archive_path):
+        return
+
+    bot = load_bot(gen, i)
+
+    bot.setup_to_run()
+
+    # 'shared' normalization : Observations are standardized by the population's shared statistics
+    standardization = load_standardization(args.states_path + '/' + str(gen) + '/')
+
+    observations, actions, rewards, offsets = [], [], [], [0]
+
+    for j in range(args.nb_tests):
+
+        set_seeds(MAX_INT-j)
+        bot.reset()
+
+        emulator.seed(MAX_INT-j)
+        obs = emulator.reset()
+
+        for k in range(args.nb_obs_per_test):
+
+            if standardization is not None:
+                obs = (obs - standardization[0]) * standardization[1]
+
+            action = bot(obs)
+
+            observations.append(obs)
+            actions.append(action)
+
+            obs, rew, done, _, _ = step(emulator, action, action_repeat)
+
+            rewards.append(rew)
+
+            if done:
+                break
+
+        offsets.append(len(rewards))
+
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+
+    with open(archive_path[:-4] + '.tmp.npz', 'wb') as f:
+        np.savez_compressed(f, observations=np.array(observations, dtype=np.float32),
+                               actions=np.array(actions),
+                               rewards=np.array(rewards, dtype=np.float32),
+                               offsets=np.array(offsets, dtype=np.int64),
+                               seeds=MAX_INT - np.arange(args.nb_tests))
+
+    os.replace(archive_path[:-4] + '.tmp.npz', archive_path)
+
+def render(gen, i):
+    """
+    Render videos of generation `gen`'s i-th selected bot's recorded trajectories by replaying its actions.
+    """
+    from gym import wrappers
+
+    path = args.states_path + '/' + str(gen) + '/'
+
+    trajectories = np.load(path + 'trajectories/' + str(i) + '.npz')
+
+    offsets = trajectories['offsets']
+
+    for j in range(len(offsets) - 1):
+
+        video_emulator = wrappers.RecordVideo(gym.make( control_task_name(task) ), path + 'videos/',
+                                              name_prefix=str(i) + '-' + str(j))
+
+        video_emulator.seed(int(trajectories['seeds'][j]))
+        video_emulator.reset()
+
+        for action in trajectories['actions'][offsets[j]:offsets[j+1]]:
+            step(video_emulator, action, action_repeat)
+
+        video_emulator.close()
+
+"""
+Distribute workload (tasks are statically split between processes)
+"""
+
+if args.generations == None:
+
+    files = [os.path.basename(x) for x in glob.glob(args.states_path + '/*')]
+
+    args.generations = sorted([int(file) for file in files if file.isdigit()])
+
+tasks = []
+
+for gen in args.generations:
+
+    if args.bots == 'elite':
+
+        scores = np.load(args.states_path + '/' + str(gen) + '/scores.npy')
+
+        tasks.append( (gen, scores.mean(axis=1).argmax()) )
+
+    else: # args.bots == 'selected':
+
+        tasks += [(gen, i) for i in range(pop_size//2)]
+
+for gen, i in tasks[rank::size]:
+
+    if args.render:
+        render(gen, i)
+    else:
+        record(gen, i)
+
+comm.Barrier()
+
+if rank == 0:
+    print(len(tasks), 'trajectory archives', 'rendered.' if args.render else 'recorded.')
@@ -0,0 +1,58 @@
+"""
+Retention policy of an experiment's saved states.
+
+Removes the generations (states, arrays & scores) that are neither among the latest ones nor multiples of a given
+thinning period, then garbage collects the content-addressed store of the states saved with
+`main.py --state_layout deduplicated` (objects no longer listed by any generation's manifest).
+Not to be run while the experiment is saving states.
+"""
+import argparse
+import os
+import shutil
+import sys
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+from utils.functions.states import collect_garbage
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--states_path', '-s', type=str, required=True,
+                    help="Path to the saved states. \
+                          <=> data/states/<env_path>/<additional_arguments>/<bots_path>/<population_size>/")
+
+parser.add_argument('--keep_last', '-l', type=int, default=1,
+                    help="Number of latest generations to keep.")
+
+parser.add_argument('--keep_every', '-e', type=int, default=0,
+                    help="Also keeps the generations that are multiples of `--keep_every` (0 : none).")
+
+parser.add_argument('--dry_run', '-d', type=int, default=0,
+                    help="Only lists the generations that would be removed.")
+
+args = parser.parse_args()
+
+if args.keep_last < 1:
+    raise RuntimeError("'keep_last' needs to be >= 1.")
+
+if args.keep_every < 0:
+    raise RuntimeError("'keep_every' needs to be >= 0.")
+
+if args.states_path[-1] == '/':
+    args.states_path = args.states_path[:-1]
+
+gens = sorted([int(file) for file in os.listdir(args.states_path)
+               if file.isdigit() and os.path.isdir(args.states_path + '/' + file)])
+
+removed_gens = [gen for gen in gens[:-args.keep_last] if args.keep_every == 0 or gen % args.keep_every != 0]
+
+print('Generations removed :', removed_gens)
+
+if not args.dry_run:
+
+    for gen in removed_gens:
+        shutil.rmtree(args.states_path + '/' + str(gen))
+
+    nb_objects, nb_bytes = collect_garbage(args.states_path)
+
+    print('Objects removed :', nb_objects, '(' + str(nb_bytes) + ' bytes)')